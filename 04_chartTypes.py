@@ -2,6 +2,7 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
+from renderTools import ChartReport
 
 # Set the aesthetic style
 sns.set(style="whitegrid")
@@ -40,4 +41,8 @@ axes[1, 1].set_title('Resource Distribution Map')
 axes[1, 1].axis('off')
 
 plt.tight_layout()
-plt.show()
\ No newline at end of file
+# REPORT_DIR=<dir> also writes the figure as an image file
+chart_report = ChartReport(formats=('png', 'svg'))
+chart_report.add('chart_types')
+plt.show()
+chart_report.render()
\ No newline at end of file
@@ -21,9 +21,9 @@ print(recent_climate[['country', 'year', 'co2', 'co2_per_capita']].head())
 # 3. Create a scatter plot relating GDP per capita to emissions per capita
 
 # Sample solution for #1:
+# from groupTools import split
 # plt.figure(figsize=(10, 6))
-# for country in countries:
-#     data = recent_climate[recent_climate['country'] == country]
+# for country, data in split(recent_climate, 'country', columns=['year', 'co2'], order=countries):
 #     plt.plot(data['year'], data['co2'], marker='o', label=country)
     
 # plt.title('CO2 Emissions by Country')
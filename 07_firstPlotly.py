@@ -1,4 +1,5 @@
 import plotly.express as px
+from figureExport import show
 import pandas as pd
 
 # Sample data (could be climate data, student outcomes, etc.)
@@ -19,4 +20,4 @@ fig = px.line(
 )
 
 # Display the figure
-fig.show()
\ No newline at end of file
+show(fig, '07_firstPlotly')  # FIGURE_EXPORT=<dir> writes HTML sharing one plotly.js instead
\ No newline at end of file
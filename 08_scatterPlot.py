@@ -1,4 +1,7 @@
 import plotly.express as px
+from figureExport import show
+from animationTools import animated_scatter
+from dashboardTools import render_mode
 
 # Load sample dataset (built into plotly)
 df = px.data.gapminder().query("year==2007")
@@ -12,7 +15,26 @@ fig = px.scatter(
     color='continent',       # Point color: Continent
     hover_name='country',    # Main tooltip label
     log_x=True,              # Log scale for x-axis
+    render_mode=render_mode(len(df)),  # WebGL once there are too many points for SVG
     title='Global Development in 2007'
 )
 
-fig.show()
\ No newline at end of file
+show(fig, '08_scatterPlot')  # FIGURE_EXPORT=<dir> writes HTML sharing one plotly.js instead
+
+# Animated over all years: a slider with one frame per year. The frames come
+# from a single sort by year and only carry the values that change; country
+# names and continent colors are stored once
+fig_animated = animated_scatter(
+    px.data.gapminder(),
+    x='gdpPercap',
+    y='lifeExp',
+    frame='year',            # Slider: one step per year
+    size='pop',
+    color='continent',
+    hover_name='country',
+    log_x=True,
+    size_max=60,
+    title='Global Development 1952-2007'
+)
+
+show(fig_animated, '08_scatterPlot_animated')
\ No newline at end of file
@@ -1,4 +1,5 @@
 import plotly.express as px
+from figureExport import show
 import pandas as pd
 
 # Sample data (resource allocation by community)
@@ -22,4 +23,4 @@ fig = px.bar(
     color_discrete_sequence=['#3366CC', '#DC3912']  # Custom colors
 )
 
-fig.show()
\ No newline at end of file
+show(fig, '09_barChart')  # FIGURE_EXPORT=<dir> writes HTML sharing one plotly.js instead
\ No newline at end of file
@@ -1,7 +1,18 @@
+import os
+import time
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+from stepCache import StepCache
+from dashboardTools import DashboardBuilder
+from groupTools import GroupIndex, split
+from rasterTools import Rasterizer
+from trendTools import TrendAccumulator
+from figureExport import show
+from liveTools import LiveFigure
+
+# Derived tables and fits are reused across runs while their inputs are unchanged
+step_cache = StepCache('.step_cache')
 
 # Set random seed for reproducibility
 np.random.seed(42)
@@ -57,12 +68,15 @@ high_income_trend = 75 + np.cumsum(np.random.normal(0.2, 0.1, num_years))
 low_income_trend = 65 + np.cumsum(np.random.normal(0.05, 0.1, num_years))
 
 # Create trend dataframe
-trend_data = []
-for i, year in enumerate(years):
-    trend_data.append({'Year': year, 'Income Group': 'High Income', 'Score': high_income_trend[i]})
-    trend_data.append({'Year': year, 'Income Group': 'Low Income', 'Score': low_income_trend[i]})
+@step_cache.step()
+def build_trend_df(years, high_income_trend, low_income_trend):
+    trend_data = []
+    for i, year in enumerate(years):
+        trend_data.append({'Year': year, 'Income Group': 'High Income', 'Score': high_income_trend[i]})
+        trend_data.append({'Year': year, 'Income Group': 'Low Income', 'Score': low_income_trend[i]})
+    return pd.DataFrame(trend_data)
 
-trend_df = pd.DataFrame(trend_data)
+trend_df = build_trend_df(years, high_income_trend, low_income_trend)
 
 # 4. Intervention impact data
 interventions = [
@@ -78,18 +92,23 @@ before_scores = [60, 64, 61, 62, 63]
 after_scores = [71, 72, 67, 68, 70]
 costs = [500, 1500, 800, 1200, 1800]  # Per student cost
 
-intervention_df = pd.DataFrame({
-    'Intervention': interventions,
-    'Before Score': before_scores,
-    'After Score': after_scores,
-    'Score Improvement': [a - b for a, b in zip(after_scores, before_scores)],
-    'Cost per Student ($)': costs,
-    'ROI': [(a - b) / c * 100 for a, b, c in zip(after_scores, before_scores, costs)]
-})
+@step_cache.step()
+def build_intervention_df(interventions, before_scores, after_scores, costs):
+    return pd.DataFrame({
+        'Intervention': interventions,
+        'Before Score': before_scores,
+        'After Score': after_scores,
+        'Score Improvement': [a - b for a, b in zip(after_scores, before_scores)],
+        'Cost per Student ($)': costs,
+        'ROI': [(a - b) / c * 100 for a, b, c in zip(after_scores, before_scores, costs)]
+    })
+
+intervention_df = build_intervention_df(interventions, before_scores, after_scores, costs)
 
 # Create the dashboard with improved layout and fixed overlapping
 # ---------------------------------------------------------------
-fig = make_subplots(
+# Traces, annotations and axis updates are collected first and the figure is built once at the end
+builder = DashboardBuilder(
     rows=2, 
     cols=2,
     subplot_titles=(
@@ -104,11 +123,12 @@ fig = make_subplots(
     ],
     vertical_spacing=0.15,  # Increased spacing to prevent overlap
     horizontal_spacing=0.08,
-    row_heights=[0.5, 0.5]  # Equal height rows
+    row_heights=[0.5, 0.5],  # Equal height rows
+    webgl_threshold=10_000  # Scatter panels with more points than this are drawn with WebGL
 )
 
 # Panel 1: School funding disparity (top left)
-fig.add_trace(
+builder.add_trace(
     go.Bar(
         x=district_df['Income Level'],
         y=district_df['Funding per Student ($)'],
@@ -120,7 +140,7 @@ fig.add_trace(
 )
 
 # Add annotation explaining the disparity - fixed positioning
-fig.add_annotation(
+builder.add_annotation(
     text="Highest-income districts receive nearly<br>twice the funding of lowest-income districts",
     x="Mid-High 20%",  # Moved annotation to different position
     y=16500,  # Positioned above the highest bar
@@ -139,32 +159,50 @@ fig.add_annotation(
 # Panel 2: Student achievement vs resources (top right)
 colorscale = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd']
 
-for i, income in enumerate(income_levels):
-    subset = outcomes_df[outcomes_df['Income Level'] == income]
-    fig.add_trace(
-        go.Scatter(
-            x=subset['Resources Index'],
-            y=subset['Math Score'],
-            mode='markers',
-            name=income,
-            marker=dict(
-                size=10,
-                opacity=0.7,
-                color=colorscale[i]
-            )
-        ),
-        row=1, col=2
-    )
+# Past this many districts the points are binned into a density grid instead of drawn one by one
+raster_threshold = 1_000_000
+
+if len(outcomes_df) > raster_threshold:
+    raster = Rasterizer(outcomes_df['Resources Index'], outcomes_df['Math Score'],
+                        width=300, height=200, log=True)
+    builder.add_trace(raster.trace(name='Districts', colorbar=dict(x=1.02, len=0.4, y=0.8)),
+                      row=1, col=2)
+else:
+    # One pass splits the districts by income level instead of one filter per level
+    subsets = split(outcomes_df, 'Income Level', columns=['Resources Index', 'Math Score'], order=income_levels)
+    for i, (income, subset) in enumerate(subsets):
+        builder.add_trace(
+            go.Scatter(
+                x=subset['Resources Index'],
+                y=subset['Math Score'],
+                mode='markers',
+                name=income,
+                marker=dict(
+                    size=10,
+                    opacity=0.7,
+                    color=colorscale[i]
+                )
+            ),
+            row=1, col=2
+        )
 
 # Add trendline for overall relationship
 all_resources = outcomes_df['Resources Index']
 all_scores = outcomes_df['Math Score']
-z = np.polyfit(all_resources, all_scores, 1)
-p = np.poly1d(z)
-x_line = np.array([min(all_resources), max(all_resources)])
-y_line = p(x_line)
 
-fig.add_trace(
+# Least squares accumulated chunk by chunk; new district rows can be added later with trend.update(x, y)
+@step_cache.step()
+def fit_trend_line(x, y, degree=1, chunk_rows=100_000):
+    x, y = np.asarray(x), np.asarray(y)
+    trend = TrendAccumulator(degree)
+    for start in range(0, len(x), chunk_rows):
+        trend.update(x[start:start + chunk_rows], y[start:start + chunk_rows])
+    return trend
+
+trend = fit_trend_line(all_resources, all_scores, 1)
+x_line, y_line = trend.line()
+
+builder.add_trace(
     go.Scatter(
         x=x_line,
         y=y_line,
@@ -177,7 +215,7 @@ fig.add_trace(
 )
 
 # Add annotation explaining the correlation - fixed positioning
-fig.add_annotation(
+builder.add_annotation(
     text="Students in well-resourced schools<br>consistently perform better,<br>regardless of income level",
     x=30,  # Moved to left side of chart
     y=75,  # Moved to top area with fewer data points
@@ -194,10 +232,17 @@ fig.add_annotation(
 )
 
 # Panel 3: Achievement gap over time (bottom left)
-fig.add_trace(
+# Group trend_df once; every series below is a slice of this index instead of a new filter
+trend_groups = GroupIndex(trend_df, by='Income Group', key='Year')
+high_years = trend_groups.get('High Income', 'Year')
+high_scores = trend_groups.get('High Income', 'Score')
+low_years = trend_groups.get('Low Income', 'Year')
+low_scores = trend_groups.get('Low Income', 'Score')
+
+builder.add_trace(
     go.Scatter(
-        x=trend_df[trend_df['Income Group'] == 'High Income']['Year'],
-        y=trend_df[trend_df['Income Group'] == 'High Income']['Score'],
+        x=high_years,
+        y=high_scores,
         mode='lines',
         name='High Income',
         line=dict(width=3, color='#1f77b4')
@@ -205,10 +250,10 @@ fig.add_trace(
     row=2, col=1
 )
 
-fig.add_trace(
+builder.add_trace(
     go.Scatter(
-        x=trend_df[trend_df['Income Group'] == 'Low Income']['Year'],
-        y=trend_df[trend_df['Income Group'] == 'Low Income']['Score'],
+        x=low_years,
+        y=low_scores,
         mode='lines',
         name='Low Income',
         line=dict(width=3, color='#ff7f0e')
@@ -217,23 +262,11 @@ fig.add_trace(
 )
 
 # Calculate the gap at the beginning and end
-start_gap = (
-    trend_df[(trend_df['Income Group'] == 'High Income') & (trend_df['Year'] == 2000)]['Score'].values[0] -
-    trend_df[(trend_df['Income Group'] == 'Low Income') & (trend_df['Year'] == 2000)]['Score'].values[0]
-)
-
-end_gap = (
-    trend_df[(trend_df['Income Group'] == 'High Income') & (trend_df['Year'] == 2022)]['Score'].values[0] -
-    trend_df[(trend_df['Income Group'] == 'Low Income') & (trend_df['Year'] == 2022)]['Score'].values[0]
-)
+start_gap = trend_groups.at('High Income', 2000, 'Score') - trend_groups.at('Low Income', 2000, 'Score')
+end_gap = trend_groups.at('High Income', 2022, 'Score') - trend_groups.at('Low Income', 2022, 'Score')
 
 # Add area to highlight the gap
-high_years = trend_df[trend_df['Income Group'] == 'High Income']['Year']
-high_scores = trend_df[trend_df['Income Group'] == 'High Income']['Score']
-low_years = trend_df[trend_df['Income Group'] == 'Low Income']['Year']
-low_scores = trend_df[trend_df['Income Group'] == 'Low Income']['Score']
-
-fig.add_trace(
+builder.add_trace(
     go.Scatter(
         x=pd.concat([high_years, low_years[::-1]]),
         y=pd.concat([high_scores, low_scores[::-1]]),
@@ -247,7 +280,7 @@ fig.add_trace(
 )
 
 # Add annotation explaining the widening gap - fixed positioning
-fig.add_annotation(
+builder.add_annotation(
     text="Gap widened from {:.1f} to {:.1f} points<br>({:.1f}% increase)".format(
         start_gap, end_gap, ((end_gap-start_gap)/start_gap*100)),
     x=2000,  # Moved to left side
@@ -265,7 +298,7 @@ fig.add_annotation(
 )
 
 # Add vertical reference line at 2010
-fig.add_vline(
+builder.add_vline(
     x=2010, 
     line_width=1.5,
     line_dash="dot", 
@@ -274,7 +307,7 @@ fig.add_vline(
     col=1
 )
 
-fig.add_annotation(
+builder.add_annotation(
     text="2010 policy change<br>did not reduce gap",
     x=2012,  # Adjusted position
     y=62,    # Moved to bottom area
@@ -288,7 +321,7 @@ fig.add_annotation(
 # Panel 4: Intervention effectiveness (bottom right)
 intervention_df_sorted = intervention_df.sort_values('ROI', ascending=False)
 
-fig.add_trace(
+builder.add_trace(
     go.Bar(
         x=intervention_df_sorted['Intervention'],
         y=intervention_df_sorted['ROI'],
@@ -299,25 +332,30 @@ fig.add_trace(
     row=2, col=2
 )
 
-# Add cost labels with cleaner positioning
-for i, intervention in enumerate(intervention_df_sorted['Intervention']):
-    cost = intervention_df_sorted.iloc[i]['Cost per Student ($)']
-    improvement = intervention_df_sorted.iloc[i]['Score Improvement']
-    
-    # Position costs above the bars, better spaced
-    fig.add_annotation(
-        text="${}<br>+{} pts".format(cost, improvement),
-        x=intervention,
-        y=intervention_df_sorted.iloc[i]['ROI'] + 1.2,  # More space above bars
-        showarrow=False,
-        font=dict(size=9),
-        bgcolor="rgba(255, 255, 255, 0.8)",
-        align="center",
-        row=2, col=2
-    )
+# Add cost labels with cleaner positioning (one label per bar, read column by column)
+builder.add_annotations(
+    [
+        dict(
+            text="${}<br>+{} pts".format(cost, improvement),
+            x=intervention,
+            y=roi + 1.2,  # Position costs above the bars, better spaced
+            showarrow=False,
+            font=dict(size=9),
+            bgcolor="rgba(255, 255, 255, 0.8)",
+            align="center"
+        )
+        for intervention, cost, improvement, roi in zip(
+            intervention_df_sorted['Intervention'],
+            intervention_df_sorted['Cost per Student ($)'],
+            intervention_df_sorted['Score Improvement'],
+            intervention_df_sorted['ROI']
+        )
+    ],
+    row=2, col=2
+)
 
 # Add annotation explaining the interventions - fixed positioning
-fig.add_annotation(
+builder.add_annotation(
     text="Targeted interventions show promising<br>returns, especially nutrition programs",
     x=intervention_df_sorted['Intervention'].iloc[0],
     y=10,  # Positioned in middle of chart
@@ -334,7 +372,7 @@ fig.add_annotation(
 )
 
 # Update layout with better spacing and sizing
-fig.update_layout(
+builder.update_layout(
     title={
         'text': "Educational Inequality: Causes, Trends, and Solutions",
         'y':0.98,
@@ -360,7 +398,7 @@ fig.update_layout(
 )
 
 # Subtitle with more space below title
-fig.add_annotation(
+builder.add_annotation(
     text="This dashboard examines disparities in school funding and their impacts on student outcomes",
     xref="paper",
     yref="paper",
@@ -373,7 +411,7 @@ fig.add_annotation(
 )
 
 # Update subplot titles with numbers but avoid overlap with plots
-for i, annotation in enumerate(fig['layout']['annotations'][:4]):  # First 4 annotations are subplot titles
+for i, annotation in enumerate(builder.layout['annotations'][:4]):  # First 4 annotations are subplot titles
     annotation['text'] = "<b>{}.</b> {}".format(i+1, annotation['text'])
     annotation['font'] = dict(size=13)
     annotation['y'] = annotation['y'] - 0.02  # Move titles up slightly
@@ -389,7 +427,7 @@ arrow_specs = [
 ]
 
 for spec in arrow_specs:
-    fig.add_annotation(
+    builder.add_annotation(
         xref="paper",
         yref="paper",
         x=spec['x'],
@@ -407,26 +445,76 @@ for spec in arrow_specs:
     )
 
 # Update axes labels with better positioning
-fig.update_xaxes(title_text="District Income Level", title_font=dict(size=12), row=1, col=1)
-fig.update_xaxes(title_text="School Resources Index", title_font=dict(size=12), row=1, col=2)
-fig.update_xaxes(title_text="Year", title_font=dict(size=12), row=2, col=1)
-fig.update_xaxes(title_text="Intervention Type", title_font=dict(size=12), row=2, col=2)
-fig.update_xaxes(tickangle=0, row=2, col=2)  # Keep intervention labels horizontal
+builder.update_xaxes(title_text="District Income Level", title_font=dict(size=12), row=1, col=1)
+builder.update_xaxes(title_text="School Resources Index", title_font=dict(size=12), row=1, col=2)
+builder.update_xaxes(title_text="Year", title_font=dict(size=12), row=2, col=1)
+builder.update_xaxes(title_text="Intervention Type", title_font=dict(size=12), row=2, col=2)
+builder.update_xaxes(tickangle=0, row=2, col=2)  # Keep intervention labels horizontal
 
-fig.update_yaxes(title_text="Funding per Student ($)", title_font=dict(size=12), row=1, col=1)
-fig.update_yaxes(title_text="Math Achievement Score", title_font=dict(size=12), row=1, col=2)
-fig.update_yaxes(title_text="Average Test Score", title_font=dict(size=12), row=2, col=1)
-fig.update_yaxes(title_text="Return on Investment (%)", title_font=dict(size=12), row=2, col=2)
+builder.update_yaxes(title_text="Funding per Student ($)", title_font=dict(size=12), row=1, col=1)
+builder.update_yaxes(title_text="Math Achievement Score", title_font=dict(size=12), row=1, col=2)
+builder.update_yaxes(title_text="Average Test Score", title_font=dict(size=12), row=2, col=1)
+builder.update_yaxes(title_text="Return on Investment (%)", title_font=dict(size=12), row=2, col=2)
 
 # Set ranges to prevent overcrowding
-fig.update_yaxes(range=[8000, 18000], row=1, col=1)
-fig.update_xaxes(range=[20, 105], row=1, col=2)
-fig.update_yaxes(range=[35, 85], row=1, col=2)
-fig.update_yaxes(range=[60, 85], row=2, col=1)
-fig.update_yaxes(range=[0, 23], row=2, col=2)
-
-# Show the figure
-fig.show()
-
-# To save as an HTML file:
-# fig.write_html("educational_inequality_dashboard.html")
\ No newline at end of file
+builder.update_yaxes(range=[8000, 18000], row=1, col=1)
+builder.update_xaxes(range=[20, 105], row=1, col=2)
+builder.update_yaxes(range=[35, 85], row=1, col=2)
+builder.update_yaxes(range=[60, 85], row=2, col=1)
+builder.update_yaxes(range=[0, 23], row=2, col=2)
+
+# Build the figure in one step and show it
+fig = builder.build()
+show(fig, 'educational_inequality_dashboard')
+print("Step cache:", step_cache.stats())
+
+# To save as an HTML file that loads plotly.js from a shared local copy:
+# FIGURE_EXPORT=figures python 10_allTogether.py
+# (or write_html(fig, "educational_inequality_dashboard.html") from figureExport)
+
+# National view: the same resources/achievement relationship for 2 million districts.
+# A scatter of every district would be hundreds of megabytes; the Rasterizer bins them
+# into a 300x200 density grid, so the figure stays small however many rows there are.
+national_rng = np.random.default_rng(7)
+national_resources = np.clip(national_rng.normal(60, 20, 2_000_000), 20, 100)
+national_scores = 40 + 0.5 * national_resources + national_rng.normal(0, 10, 2_000_000)
+national_raster = Rasterizer(national_resources, national_scores, width=300, height=200, log=True)
+national_fig = go.Figure(national_raster.trace())
+national_fig.update_layout(title="Math Achievement vs School Resources (2,000,000 districts)",
+                           xaxis_title="School Resources Index", yaxis_title="Math Achievement Score")
+show(national_fig, 'national_district_density')
+# (in Jupyter, national_raster.figure_widget() re-bins the visible districts on every zoom)
+
+# Live mode: LIVE_DASHBOARD=8050 python 10_allTogether.py serves the dashboard on
+# http://127.0.0.1:8050/ and streams new districts into it until Ctrl+C. Only the
+# new points, the trend line and the annotation text are sent, at most 60 times a second.
+live_port = os.environ.get('LIVE_DASHBOARD')
+if live_port and len(outcomes_df) <= raster_threshold:
+    live = LiveFigure(fig, fps=60, title='Educational inequality (live)')
+    print("Live dashboard at", live.serve(port=int(live_port)))
+    correlation_note = live.annotation_index("Students in well-resourced schools")
+    feed = np.random.default_rng()
+    districts = len(outcomes_df)
+    try:
+        while True:
+            # A few districts every 10 ms, more often than the page redraws
+            new_resources = np.clip(feed.normal(60, 20, 5), 20, 100).round(1)
+            new_scores = (40 + 0.5 * new_resources + feed.normal(0, 10, 5)).round(1)
+            new_income = feed.choice(income_levels, 5)
+            for income in income_levels:
+                arrived = new_income == income
+                if arrived.any():
+                    live.extend_trace(income, x=new_resources[arrived], y=new_scores[arrived])
+            trend.update(new_resources, new_scores)
+            x_line, y_line = trend.line()
+            live.update_trace('Trend Line', x=x_line, y=y_line)
+            districts += len(new_resources)
+            live.update_annotation(
+                correlation_note,
+                text="Students in well-resourced schools<br>consistently perform better,<br>regardless of income level"
+                     "<br>({} districts, R\u00b2 = {:.2f})".format(districts, trend.r_squared()))
+            time.sleep(0.01)
+    except KeyboardInterrupt:
+        pass
+    live.close()
+    print("Live updates:", live.stats())
@@ -4,10 +4,16 @@
 # In[ ]:
 
 
+import os
 import pandas as pd
 import numpy as np
 from openpyxl import load_workbook
 import warnings
+from columnStore import ColumnStore, mapped_columns
+
+# Intermediate datasets are written once and memory-mapped back on later runs
+# (copy-on-write: the frames can be edited in place, the stored files don't change)
+store = ColumnStore('.column_store')
 
 def demonstrate_excel_handling():
     """
@@ -40,6 +46,7 @@ except FileNotFoundError:
     }
     df_sample = pd.DataFrame(data)
     df_sample.to_excel('sales_data.xlsx', sheet_name='Sales', index=False)
+    store.write('sales_data', df_sample, source='sales_data.xlsx')
     print("Sample Excel file created")
 
 
@@ -50,16 +57,21 @@ except FileNotFoundError:
 print("\nPart 2: Working with Multiple Sheets")
 print("-" * 50)
 
-# Create a multi-sheet Excel file
-with pd.ExcelWriter('multi_sheet_sales.xlsx') as writer:
-    # Create different sheets for each region
-    for region in ['North', 'South', 'East', 'West']:
-        df_region = df_sample[df_sample['Region'] == region]
-        df_region.to_excel(writer, sheet_name=region, index=False)
-        
-    # Create a summary sheet with different formatting
-    summary_data = df_sample.groupby('Region')['Sales'].agg(['sum', 'mean', 'count'])
-    summary_data.to_excel(writer, sheet_name='Summary')
+# The sample data is parsed from Excel only if sales_data.xlsx changed since it was stored
+df_sample = store.read_through('sales_data', lambda: pd.read_excel('sales_data.xlsx'),
+                               source='sales_data.xlsx')
+
+# Create a multi-sheet Excel file (once, like sales_data.xlsx, so the stored copy below stays valid)
+if not os.path.exists('multi_sheet_sales.xlsx'):
+    with pd.ExcelWriter('multi_sheet_sales.xlsx') as writer:
+        # Create different sheets for each region
+        for region in ['North', 'South', 'East', 'West']:
+            df_region = df_sample[df_sample['Region'] == region]
+            df_region.to_excel(writer, sheet_name=region, index=False)
+            
+        # Create a summary sheet with different formatting
+        summary_data = df_sample.groupby('Region')['Sales'].agg(['sum', 'mean', 'count'])
+        summary_data.to_excel(writer, sheet_name='Summary')
 
 # Reading specific sheets
 def read_multiple_sheets():
@@ -74,7 +86,11 @@ def read_multiple_sheets():
     
     return all_sheets
 
-sheets_dict = read_multiple_sheets()
+# The sheets are parsed only if multi_sheet_sales.xlsx changed since they were stored; later
+# steps (and worker processes, via store.handle) map the stored sheets instead of copies
+sheets_dict = store.read_through('multi_sheet_sales', read_multiple_sheets, source='multi_sheet_sales.xlsx')
+print("Memory-mapped columns of North:", mapped_columns(sheets_dict['North']))
+print("Stored datasets:", store.names())
 
 
 # In[ ]:
@@ -7,10 +7,13 @@
 import json
 import pandas as pd
 from pandas import json_normalize
+from stageProfiler import section, end_section, profile_table
 
 def print_section(title):
     """Helper function to print formatted section titles"""
     print(f"\n{'='*80}\n{title}\n{'='*80}")
+    # Time each section until the next one starts (only when profiling is enabled)
+    section(title)
 
 
 # In[ ]:
@@ -152,6 +155,13 @@ pivot_df = df5.pivot(columns='week', values='score', index='student')
 pivot_df.columns = [f'Week_{col}' for col in pivot_df.columns]
 print(pivot_df)
 
+# Close the last section and show the timings (run with PIPELINE_PROFILE=memory)
+end_section(rows_out=len(pivot_df))
+section_times = profile_table()
+if not section_times.empty:
+    print("\nTime per section:")
+    print(section_times[['stage', 'wall_s', 'cpu_s', 'mem_delta_mb']])
+
 
 # In[ ]:
 
@@ -9,11 +9,19 @@ import numpy as np
 from datetime import datetime, timedelta
 import matplotlib.pyplot as plt
 import seaborn as sns
+from cleaningTools import split_sentinel_column, validate_rules
+from missingTools import MissingProfile, MissingHeatmap
+from stageProfiler import stage, profiled, profile_table
+from lazyPipeline import LazyFrame, collect_all
+from renderTools import ChartReport
 
 # Set our visual style
 plt.style.use('seaborn-v0_8')
 sns.set_palette("husl")
 
+# Charts shown below are also collected for an image report (see the last cell)
+chart_report = ChartReport()
+
 # Create sample data
 np.random.seed(42)
 dates = [datetime(2023, 1, 1) + timedelta(days=x) for x in range(365)]
@@ -42,16 +50,19 @@ df_missing.loc[10:30, 'quantity'] = None  # Python None
 df_missing.loc[40:60, 'price'] = np.nan   # NumPy NaN
 df_missing.loc[70:90, 'category'] = ''    # Empty string
 
+missing_profile = MissingProfile(df_missing)
+
 print("Dataset with missing values:")
 print("\nMissing value counts:")
-print(df_missing.isnull().sum())
+print(missing_profile.counts())
 print("\nSample rows with missing values:")
-print(df_missing[df_missing.isnull().any(axis=1)].head())
+print(df_missing.iloc[np.flatnonzero(missing_profile.any_missing())[:5]])
 
 # Visualize missing values
 plt.figure(figsize=(10, 6))
-sns.heatmap(df_missing.isnull(), yticklabels=False, cbar=False)
+MissingHeatmap(missing_profile).draw()
 plt.title('Missing Values Pattern')
+chart_report.add('missing_pattern')
 plt.show()
 
 
@@ -108,6 +119,7 @@ plt.title('Frequency of Category Variations')
 plt.xlabel('Category')
 plt.ylabel('Count')
 plt.tight_layout()
+chart_report.add('category_variations')
 plt.show()
 
 print("\n3. Impact of Inconsistent Formats:")
@@ -133,6 +145,17 @@ print("\nUnique values in mixed_quantity:")
 print(df_mixed['mixed_quantity'].value_counts().head())
 print("\nData type:", df_mixed['mixed_quantity'].dtype)
 
+# Split the column into a numeric part and a status code in one pass
+quantity_values, quantity_status = split_sentinel_column(df_mixed['mixed_quantity'])
+df_mixed['quantity_value'] = quantity_values
+df_mixed['quantity_status'] = quantity_status
+
+print("\nAfter splitting sentinel strings:")
+print(df_mixed[['mixed_quantity', 'quantity_value', 'quantity_status']].iloc[[0, 200, 251]])
+print("\nStatus counts:")
+print(df_mixed['quantity_status'].value_counts())
+print("\nData types:", df_mixed['quantity_value'].dtype, df_mixed['quantity_status'].dtype)
+
 
 # In[ ]:
 
@@ -144,13 +167,25 @@ df_incorrect.loc[300:320, 'quantity'] = -100  # Impossible negative quantities
 df_incorrect.loc[321:340, 'price'] = 0        # Zero prices
 df_incorrect.loc[341:360, 'store_id'] = 'UNKNOWN'  # Invalid store ID
 
+# Describe what "correct" means once, as rules
+incorrect_value_rules = [
+    {'name': 'negative_quantities', 'type': 'range', 'column': 'quantity', 'min': 0},
+    {'name': 'zero_prices', 'type': 'not_equal', 'column': 'price', 'value': 0},
+    {'name': 'unknown_stores', 'type': 'not_equal', 'column': 'store_id', 'value': 'UNKNOWN'}
+]
+
+# All rules are checked in one pass without copying any rows
+report = validate_rules(df_incorrect, incorrect_value_rules)
+
 print("Examples of incorrect values:")
 print("\nNegative quantities:")
-print(df_incorrect[df_incorrect['quantity'] < 0].head())
+print(df_incorrect.iloc[report.rows('negative_quantities')[:5]])
 print("\nZero prices:")
-print(df_incorrect[df_incorrect['price'] == 0].head())
+print(df_incorrect.iloc[report.rows('zero_prices')[:5]])
 print("\nInvalid store IDs:")
-print(df_incorrect[df_incorrect['store_id'] == 'UNKNOWN'].head())
+print(df_incorrect.iloc[report.rows('unknown_stores')[:5]])
+print("\nViolation counts:")
+print(report.counts)
 
 
 # In[ ]:
@@ -201,6 +236,7 @@ plt.xlabel('Quantity')
 plt.ylabel('Frequency')
 
 plt.tight_layout()
+chart_report.add('outlier_distributions')
 plt.show()
 
 # Calculate and show statistical measures for outlier detection
@@ -271,17 +307,27 @@ print(df_no_outliers[['price', 'quantity']].describe())
 
 # Cleaning
 
-def clean_data(df):
+@profiled()
+def clean_data(df, rules=None):
+    # The rules that define incorrect values (default: the ones used above)
+    if rules is None:
+        rules = [
+            {'name': 'negative_quantities', 'type': 'range', 'column': 'quantity', 'min': 0},
+            {'name': 'zero_prices', 'type': 'not_equal', 'column': 'price', 'value': 0},
+            {'name': 'unknown_stores', 'type': 'not_equal', 'column': 'store_id', 'value': 'UNKNOWN'}
+        ]
     print("Starting data cleaning process...")
     df_clean = df.copy()
     
     # 1. Handle missing values
     print("\n1. Handling missing values...")
-    missing_before = df_clean.isnull().sum()
-    df_clean['quantity'] = df_clean['quantity'].fillna(df_clean['quantity'].median())
-    df_clean['price'] = df_clean['price'].fillna(df_clean['price'].median())
-    df_clean['category'] = df_clean['category'].fillna('Unknown')
-    missing_after = df_clean.isnull().sum()
+    with stage('1. Handling missing values', rows_in=len(df_clean)) as s:
+        missing_before = df_clean.isnull().sum()
+        df_clean['quantity'] = df_clean['quantity'].fillna(df_clean['quantity'].median())
+        df_clean['price'] = df_clean['price'].fillna(df_clean['price'].median())
+        df_clean['category'] = df_clean['category'].fillna('Unknown')
+        missing_after = df_clean.isnull().sum()
+        s.rows_out = len(df_clean)
     
     print("Missing values before:")
     print(missing_before)
@@ -293,29 +339,26 @@ def clean_data(df):
     print("Sample of categories before standardization:")
     print(df_clean['category'].value_counts().head())
     
-    df_clean['date_parsed'] = pd.to_datetime(df_clean['date_string'], format='mixed')
-    df_clean['category'] = df_clean['category'].str.title()
+    with stage('2. Standardizing formats', rows_in=len(df_clean)) as s:
+        df_clean['date_parsed'] = pd.to_datetime(df_clean['date_string'], format='mixed')
+        df_clean['category'] = df_clean['category'].str.title()
+        s.rows_out = len(df_clean)
     
     print("\nSample of categories after standardization:")
     print(df_clean['category'].value_counts().head())
     
     # 3. Fix incorrect values
     print("\n3. Fixing incorrect values...")
-    incorrect_counts_before = {
-        'negative_quantities': len(df_clean[df_clean['quantity'] < 0]),
-        'zero_prices': len(df_clean[df_clean['price'] == 0]),
-        'unknown_stores': len(df_clean[df_clean['store_id'] == 'UNKNOWN'])
-    }
-    
-    df_clean.loc[df_clean['quantity'] < 0, 'quantity'] = 0
-    df_clean.loc[df_clean['price'] == 0, 'price'] = df_clean['price'].median()
-    df_clean.loc[df_clean['store_id'] == 'UNKNOWN', 'store_id'] = 'S01'
-    
-    incorrect_counts_after = {
-        'negative_quantities': len(df_clean[df_clean['quantity'] < 0]),
-        'zero_prices': len(df_clean[df_clean['price'] == 0]),
-        'unknown_stores': len(df_clean[df_clean['store_id'] == 'UNKNOWN'])
-    }
+    with stage('3. Fixing incorrect values', rows_in=len(df_clean)) as s:
+        report_before = validate_rules(df_clean, rules)
+        incorrect_counts_before = report_before.to_dict()
+        
+        df_clean.loc[report_before.mask('negative_quantities'), 'quantity'] = 0
+        df_clean.loc[report_before.mask('zero_prices'), 'price'] = df_clean['price'].median()
+        df_clean.loc[report_before.mask('unknown_stores'), 'store_id'] = 'S01'
+        
+        incorrect_counts_after = validate_rules(df_clean, rules).to_dict()
+        s.rows_out = len(df_clean)
     
     print("Incorrect values before cleaning:")
     print(incorrect_counts_before)
@@ -335,8 +378,10 @@ def clean_data(df):
     print("Before outlier removal:")
     print(df_clean[['price', 'quantity']].describe())
     
-    df_clean['price'] = remove_outliers(df_clean['price'])
-    df_clean['quantity'] = remove_outliers(df_clean['quantity'])
+    with stage('4. Handling outliers', rows_in=len(df_clean)) as s:
+        df_clean['price'] = remove_outliers(df_clean['price'])
+        df_clean['quantity'] = remove_outliers(df_clean['quantity'])
+        s.rows_out = len(df_clean)
     
     print("\nAfter outlier removal:")
     print(df_clean[['price', 'quantity']].describe())
@@ -374,7 +419,13 @@ df_problems.loc[156:160, 'quantity'] = 99999
 
 # Clean the data
 print("Starting data cleaning demonstration...")
-df_cleaned = clean_data(df_problems)
+df_cleaned = clean_data(df_problems, incorrect_value_rules)
+
+# Stage timings (run with PIPELINE_PROFILE=memory, log or a .jsonl path to record them)
+stage_times = profile_table()
+if not stage_times.empty:
+    print("\nTime per cleaning stage:")
+    print(stage_times[['path', 'wall_s', 'cpu_s', 'rows_in', 'rows_out', 'mem_delta_mb']])
 
 # Visualize the results
 fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(15, 12))
@@ -398,6 +449,7 @@ ax4.set_title('Cleaned Quantity Distribution')
 ax4.set_ylabel('Quantity')
 
 plt.tight_layout()
+chart_report.add('cleaning_before_after')
 plt.show()
 
 # Compare summary statistics
@@ -415,3 +467,52 @@ print(f"Cleaned dataset size: {len(df_cleaned)}")
 print(f"\nUnique categories before cleaning: {df_problems['category'].nunique()}")
 print(f"Unique categories after cleaning: {df_cleaned['category'].nunique()}")
 
+
+# In[ ]:
+
+
+# Lazy Pipeline
+
+# The same cleaning steps as clean_data(), recorded instead of run.
+# Nothing is computed until a result is requested.
+lazy_clean = (LazyFrame.from_frame(df_problems, label='df_problems')
+              .fillna('quantity', 'median')
+              .fillna('price', 'median')
+              .fillna('category', 'Unknown')
+              .to_datetime('date_string', target='date_parsed', format='mixed')
+              .map_str('category', 'title')
+              .replace_where('quantity', ('quantity', '<', 0), 0)
+              .replace_where('price', ('price', '==', 0), 'median')
+              .replace_where('store_id', ('store_id', '==', 'UNKNOWN'), 'S01')
+              .clip_iqr('price')
+              .clip_iqr('quantity'))
+
+# Only the category steps are needed for the category counts
+category_counts = lazy_clean.value_counts('category')
+print("Plan for the category counts:")
+print(category_counts.explain())
+
+# The date filter moves in front of the category steps, so they see fewer rows
+january_categories = (LazyFrame.from_frame(df_problems, label='df_problems')
+                      .fillna('category', 'Unknown')
+                      .map_str('category', 'title')
+                      .filter(('date', '<', '2023-02-01'))
+                      .value_counts('category'))
+print("\nPlan for the January category counts:")
+print(january_categories.explain())
+
+# Requested together, the shared cleaning steps run once
+lazy_cleaned, lazy_counts, lazy_january = collect_all(lazy_clean, category_counts, january_categories)
+print("\nLazy result matches clean_data():", lazy_cleaned.equals(df_cleaned))
+print(lazy_counts)
+print(lazy_january)
+
+
+# In[ ]:
+
+
+# Report
+
+# Every chart above as an image file, rendered in parallel worker processes
+# (charts are only collected when REPORT_DIR is set: REPORT_DIR=report python "7. DataClean.py")
+chart_report.render()
@@ -7,7 +7,15 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-import seaborn as sns
+from missingTools import MissingProfile, MissingHeatmap, ImputationComparison, interpolate_gaps
+from missingTools import rebuild_timestamps, impute_time_series, KNNImputer
+from outOfCore import PartitionedFrame
+from renderTools import ChartReport
+import tempfile
+import shutil
+
+# Charts shown below are also collected for an image report (see the last cell)
+chart_report = ChartReport()
 
 # Set random seed for reproducibility
 np.random.seed(42)
@@ -31,13 +39,22 @@ df.loc[np.random.choice(n_samples, 50), 'dates'] = pd.NaT  # Time missing
 
 print("Dataset with missing values:")
 print(df.head(10))
+
+# Build the null masks once and reuse them for every summary below
+profile = MissingProfile(df)
+
 print("\nMissing value summary:")
-print(df.isnull().sum())
+print(profile.counts())
+print("\nGaps per column:")
+print(profile.summary())
+print("\nMost common missingness patterns:")
+print(profile.patterns().head())
 
-# Visualize missing values pattern
+# Visualize missing values pattern (rows are binned, so this scales to large frames)
 plt.figure(figsize=(10, 6))
-sns.heatmap(df.isnull(), yticklabels=False, cbar=False)
+MissingHeatmap(profile).draw()
 plt.title('Missing Values Pattern')
+chart_report.add('missing_pattern')
 plt.show()
 
 
@@ -64,6 +81,12 @@ print("Shape after dropping rows with missing numeric_normal:", df_dropped_subse
 df_dropped_thresh = df.dropna(thresh=3)
 print("Shape after keeping rows with at least 3 non-null values:", df_dropped_thresh.shape)
 
+# The same row counts straight from the null masks, without dropping anything
+print("\nRows kept according to the missing value profile:")
+print("Drop All:", (~profile.any_missing()).sum())
+print("Drop Subset:", len(df) - profile.counts()['numeric_normal'])
+print("Drop Threshold:", profile.rows_meeting_thresh(3).sum())
+
 # Visualize results
 methods = ['Original', 'Drop All', 'Drop Subset', 'Drop Threshold']
 counts = [len(df), len(df_dropped_all), len(df_dropped_subset), len(df_dropped_thresh)]
@@ -74,6 +97,7 @@ plt.title('Impact of Different Dropping Methods')
 plt.ylabel('Number of Rows')
 plt.xticks(rotation=45)
 plt.tight_layout()
+chart_report.add('dropping_methods')
 plt.show()
 
 
@@ -86,33 +110,34 @@ plt.show()
 Demonstrate simple imputation methods using basic statistics.
 """
 
-# Create copies for different imputation methods
-df_mean = df.copy()
-df_median = df.copy()
-df_mode = df.copy()
-df_constant = df.copy()
+# Compare methods on one column instead of copying the whole frame per method.
+# Only the values for the missing positions are computed for each method.
+numeric_comparison = ImputationComparison(df['numeric_normal'], constant=0)
+categorical_comparison = ImputationComparison(df['categorical'])
 
 # Mean imputation
-df_mean['numeric_normal'] = df['numeric_normal'].fillna(df['numeric_normal'].mean())
+mean_imputed = numeric_comparison.imputed('mean')
 
 # Median imputation
-df_median['numeric_normal'] = df['numeric_normal'].fillna(df['numeric_normal'].median())
+median_imputed = numeric_comparison.imputed('median')
 
 # Mode imputation for categorical
-df_mode['categorical'] = df['categorical'].fillna(df['categorical'].mode()[0])
+mode_imputed = categorical_comparison.imputed('mode')
+print("Mode used for categorical:", categorical_comparison.fill('mode')[0])
 
 # Constant imputation
-df_constant['numeric_normal'] = df['numeric_normal'].fillna(0)
+constant_imputed = numeric_comparison.imputed('constant')
 
 # Visualize numeric imputation results
 plt.figure(figsize=(12, 6))
 plt.hist(df['numeric_normal'].dropna(), bins=30, alpha=0.5, label='Original (non-missing)')
-plt.hist(df_mean['numeric_normal'], bins=30, alpha=0.5, label='Mean Imputation')
-plt.hist(df_median['numeric_normal'], bins=30, alpha=0.5, label='Median Imputation')
-plt.hist(df_constant['numeric_normal'], bins=30, alpha=0.5, label='Zero Imputation')
+plt.hist(mean_imputed, bins=30, alpha=0.5, label='Mean Imputation')
+plt.hist(median_imputed, bins=30, alpha=0.5, label='Median Imputation')
+plt.hist(constant_imputed, bins=30, alpha=0.5, label='Zero Imputation')
 plt.title('Distribution of Different Imputation Methods')
 plt.legend()
 plt.tight_layout()
+chart_report.add('imputation_distributions')
 plt.show()
 
 
@@ -160,6 +185,7 @@ plt.plot(df_seq.index[sample_range],
 plt.title('Comparison of Sequential Imputation Methods')
 plt.legend()
 plt.grid(True)
+chart_report.add('sequential_imputation')
 plt.show()
 
 
@@ -184,6 +210,11 @@ df_interp['polynomial'] = df_interp['numeric_normal'].interpolate(method='polyno
 # Nearest interpolation
 df_interp['nearest'] = df_interp['numeric_normal'].interpolate(method='nearest')
 
+# Gap-aware polynomial: fit only the points around each gap instead of all points
+gap_positions, gap_fills = interpolate_gaps(df_interp['numeric_normal'], method='polynomial', order=2)
+df_interp['polynomial_local'] = df_interp['numeric_normal']
+df_interp.iloc[gap_positions, df_interp.columns.get_loc('polynomial_local')] = gap_fills
+
 # Visualize interpolation methods
 plt.figure(figsize=(15, 6))
 sample_range = slice(20, 70)  # Select a range with missing values
@@ -200,39 +231,146 @@ plt.plot(df_interp.index[sample_range],
 plt.plot(df_interp.index[sample_range], 
          df_interp['nearest'].iloc[sample_range], 
          'D-', label='Nearest')
+plt.plot(df_interp.index[sample_range], 
+         df_interp['polynomial_local'].iloc[sample_range], 
+         'x-', label='Polynomial (gap-aware)')
 
 plt.title('Comparison of Interpolation Methods')
 plt.legend()
 plt.grid(True)
+chart_report.add('interpolation_methods')
 plt.show()
 
 
 # In[ ]:
 
 
+# Time-aware Imputation
+# ==========================
+"""
+Use the dates column instead of row positions when filling values.
+"""
+
+df_time = df[['numeric_normal', 'dates']].copy()
+
+# Missing timestamps can be rebuilt from the regular daily frequency
+df_time['dates_rebuilt'] = rebuild_timestamps(df_time['dates'], freq='D')
+print("Missing dates before:", df_time['dates'].isna().sum())
+print("Missing dates after:", df_time['dates_rebuilt'].isna().sum())
+
+# Time-weighted interpolation and a 7-day rolling mean fill
+df_time['time_interp'] = impute_time_series(df_time, 'numeric_normal', 'dates', method='time')
+df_time['rolling_7d'] = impute_time_series(df_time, 'numeric_normal', 'dates',
+                                           method='rolling', window='7D')
+
+# The same works per entity, e.g. one series per store
+# (n_jobs > 1 processes the stores in parallel worker processes)
+df_time['store_id'] = np.random.choice(['S01', 'S02', 'S03', 'S04'], n_samples)
+df_time['time_interp_by_store'] = impute_time_series(df_time, 'numeric_normal', 'dates',
+                                                     entity_column='store_id', method='time', freq='D')
+
+print("\nTime-aware imputation results:")
+print(df_time.iloc[sample_range].head(10))
+
+plt.figure(figsize=(15, 6))
+plt.plot(df_time['dates_rebuilt'].iloc[sample_range],
+         df_time['numeric_normal'].iloc[sample_range],
+         'o-', label='Original', alpha=0.5)
+plt.plot(df_time['dates_rebuilt'].iloc[sample_range],
+         df_time['time_interp'].iloc[sample_range],
+         's-', label='Time Interpolation')
+plt.plot(df_time['dates_rebuilt'].iloc[sample_range],
+         df_time['rolling_7d'].iloc[sample_range],
+         '^-', label='7-Day Rolling Mean')
+plt.title('Time-aware Imputation')
+plt.legend()
+plt.grid(True)
+chart_report.add('time_aware_imputation')
+plt.show()
+
+
+# In[ ]:
+
+
+# Multivariate Imputation
+# ==========================
+"""
+Use the other columns to predict each missing value (k-nearest neighbours).
+"""
+
+knn_columns = ['numeric_uniform', 'numeric_normal', 'categorical']
+
+# Fit once, then reuse the fitted imputer on new batches of rows
+knn = KNNImputer(n_neighbors=5).fit(df, columns=knn_columns)
+df_knn = knn.transform(df)
+
+print("Missing values before KNN imputation:")
+print(df[knn_columns].isnull().sum())
+print("\nMissing values after KNN imputation:")
+print(df_knn[knn_columns].isnull().sum())
+
+new_batch = df.iloc[500:520]
+print("\nFitted imputer applied to a new batch:")
+print(knn.transform(new_batch)[knn_columns].head())
+
+
+# In[ ]:
+
+
+# Out-of-core Imputation
+# ==========================
+"""
+The same fills on data kept on disk in partitions, for datasets larger than memory.
+"""
+
+workdir = tempfile.mkdtemp()
+
+# 4 partitions of 250 rows (n_jobs > 1 processes them in parallel worker processes)
+df_parts = PartitionedFrame.from_frame(df, workdir, partition_rows=250, n_jobs=1)
+
+# The median is computed over all partitions, and fills carry values across partition edges
+parts_median = df_parts.fillna('numeric_normal', 'median').to_pandas()['numeric_normal']
+parts_ffill = df_parts.ffill('numeric_normal').to_pandas()['numeric_normal']
+parts_linear = df_parts.interpolate('numeric_uniform').to_pandas()['numeric_uniform']
+
+print("Partitions:", df_parts.n_partitions, "rows:", len(df_parts))
+print("Same as in-memory median fill:", parts_median.equals(median_imputed))
+print("Same as in-memory forward fill:", parts_ffill.equals(df_seq['forward_fill']))
+print("Same as in-memory interpolation:", parts_linear.equals(df['numeric_uniform'].interpolate()))
+
+# Remove the partitions of every derived frame
+shutil.rmtree(workdir)
+
+
+# In[ ]:
+
+
 # Statistical Comparison
 # ==========================
 """
 Compare statistical properties of different imputation methods.
 """
 
-stats_df = pd.DataFrame({
-    'Original': df['numeric_normal'].dropna().describe(),
-    'Mean': df_mean['numeric_normal'].describe(),
-    'Median': df_median['numeric_normal'].describe(),
-    'Forward Fill': df_seq['forward_fill'].describe(),
-    'Linear Interp': df_interp['linear'].describe()
-})
+# Statistics of the non-missing values are shared by every method
+stats_df = numeric_comparison.table(
+    ['mean', 'median', 'ffill', 'linear'],
+    labels={'mean': 'Mean', 'median': 'Median', 'ffill': 'Forward Fill', 'linear': 'Linear Interp'}
+)
 
 print("Statistical Comparison of Different Methods:")
 print(stats_df)
 
+# All supported methods side by side
+print("\nAll imputation methods:")
+print(numeric_comparison.table(['mean', 'median', 'mode', 'constant', 'ffill', 'bfill',
+                                'linear', 'polynomial', 'nearest']))
+
 # Visualize distributions
 plt.figure(figsize=(12, 6))
 methods = ['Original', 'Mean', 'Median', 'Forward Fill', 'Linear Interp']
 data = [df['numeric_normal'].dropna(),
-        df_mean['numeric_normal'],
-        df_median['numeric_normal'],
+        mean_imputed,
+        median_imputed,
         df_seq['forward_fill'],
         df_interp['linear']]
 
@@ -240,6 +378,7 @@ plt.boxplot(data, tick_labels=methods)
 plt.title('Distribution Comparison of Different Imputation Methods')
 plt.xticks(rotation=45)
 plt.tight_layout()
+chart_report.add('imputation_boxplots')
 plt.show()
 
 
@@ -247,4 +386,12 @@ plt.show()
 
 
 
+# Report
+# ======
+"""
+Write every chart above as an image file. Charts are only collected when
+REPORT_DIR is set (REPORT_DIR=report python "9. MissingData.py"); they are then
+rendered in parallel worker processes.
+"""
 
+chart_report.render()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Animated scatter plots with a time slider, built from precomputed frames.
+
+px.scatter(..., animation_frame='year') filters the frame once per year
+and repeats every trace attribute (names, colors, hover templates, the
+hover text of every country) in every frame. animated_scatter() sorts the
+rows once by (year, category) so each frame's points per category are a
+contiguous slice, and puts everything that does not change over time on
+the base traces:
+
+    - name, legend group, marker color, size scaling and hover template
+    - the hover text (and ids, for smooth transitions) of a category when
+      the same entities appear in the same order in every frame
+
+so a frame only holds the x, y (and size) arrays of each category. The
+axis ranges are fixed over all frames so the axes don't jump.
+
+    fig = animated_scatter(px.data.gapminder(), x='gdpPercap', y='lifeExp', frame='year',
+                           size='pop', color='continent', hover_name='country', log_x=True)
+
+Written with figureExport (show() with FIGURE_EXPORT, or write_html), the
+frames are also loaded lazily: the page draws the first frame, then adds
+the others in batches.
+"""
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+
+def _axis_range(values, log):
+    values = np.asarray(values, dtype=float)
+    if log:
+        values = np.log10(values[values > 0])
+    values = values[np.isfinite(values)]
+    low, high = (values.min(), values.max()) if len(values) else (0.0, 1.0)
+    pad = (high - low) * 0.05 or 0.5
+    return [low - pad, high + pad]
+
+
+def animated_scatter(df, x, y, frame, color=None, size=None, hover_name=None, log_x=False, log_y=False,
+                     size_max=20, colors=None, duration=500, title=None):
+    """
+    Scatter plot with one animation frame per value of the frame column.
+
+    Parameters:
+        df: the data, all frames
+        x, y: columns on the axes
+        frame: column whose values are the slider steps (e.g. 'year'), in sorted order
+        color: optional category column; one trace per category, in order of appearance
+        size: optional column for marker areas (scaled like px, largest marker size_max)
+        hover_name: optional column shown in bold on hover
+        colors: colors of the categories (default: plotly's qualitative palette)
+        duration: milliseconds per frame when playing
+    """
+    frame_codes, frame_values = pd.factorize(df[frame], sort=True)
+    if color is not None:
+        color_codes, categories = pd.factorize(df[color])
+    else:
+        color_codes, categories = np.zeros(len(df), dtype=np.intp), pd.Index([None])
+    n_frames, n_colors = len(frame_values), len(categories)
+    # The single sort: by frame, then category; each (frame, category) is a slice
+    key = frame_codes * n_colors + color_codes
+    valid = (frame_codes >= 0) & (color_codes >= 0)
+    order = np.flatnonzero(valid)[np.argsort(key[valid], kind='stable')]
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(key[valid], minlength=n_frames * n_colors))])
+
+    columns = {'x': df[x].to_numpy()[order], 'y': df[y].to_numpy()[order]}
+    if size is not None:
+        columns['size'] = df[size].to_numpy()[order]
+    if hover_name is not None:
+        columns['hovertext'] = df[hover_name].to_numpy()[order]
+
+    def part(name, f, c):
+        cell = f * n_colors + c
+        return columns[name][offsets[cell]:offsets[cell + 1]]
+
+    colors = colors or px.colors.qualitative.Plotly
+    sizeref = np.nanmax(columns['size']) / size_max ** 2 if size is not None and len(order) else None
+    hover = [f'{x}=%{{x}}', f'{y}=%{{y}}'] + ([f'{size}=%{{marker.size}}'] if size is not None else [])
+
+    base_traces, constant_hover = [], []
+    for c, category in enumerate(categories):
+        trace = {'type': 'scatter', 'mode': 'markers', 'x': part('x', 0, c), 'y': part('y', 0, c),
+                 'marker': {'color': colors[c % len(colors)]}}
+        if color is not None:
+            trace.update(name=str(category), legendgroup=str(category), showlegend=True)
+        lines = ([f'{color}={category}'] if color is not None else []) + hover
+        if hover_name is not None:
+            lines.insert(0, '<b>%{hovertext}</b><br>')
+            # Entities that are the same in every frame are sent once, with the base trace
+            first = part('hovertext', 0, c)
+            constant = all(np.array_equal(part('hovertext', f, c), first) for f in range(1, n_frames))
+            constant_hover.append(constant)
+            trace['hovertext'] = first
+            if constant:
+                trace['ids'] = first
+        trace['hovertemplate'] = '<br>'.join(lines) + '<extra></extra>'
+        if size is not None:
+            trace['marker'].update(size=part('size', 0, c), sizemode='area', sizeref=sizeref)
+        base_traces.append(trace)
+
+    frames = []
+    for f, value in enumerate(frame_values):
+        data = []
+        for c in range(n_colors):
+            changed = {'x': part('x', f, c), 'y': part('y', f, c)}
+            if size is not None:
+                changed['marker'] = {'size': part('size', f, c)}
+            if hover_name is not None and not constant_hover[c]:
+                changed['hovertext'] = part('hovertext', f, c)
+            data.append(changed)
+        frames.append({'name': str(value), 'data': data, 'traces': list(range(n_colors))})
+
+    step_args = {'frame': {'duration': 0, 'redraw': False}, 'mode': 'immediate', 'transition': {'duration': 0}}
+    play_args = {'frame': {'duration': duration, 'redraw': False}, 'fromcurrent': True,
+                 'transition': {'duration': duration, 'easing': 'linear'}}
+    layout = {
+        'title': {'text': title} if title else None,
+        'xaxis': {'title': {'text': x}, 'type': 'log' if log_x else 'linear', 'range': _axis_range(df[x], log_x)},
+        'yaxis': {'title': {'text': y}, 'type': 'log' if log_y else 'linear', 'range': _axis_range(df[y], log_y)},
+        'legend': {'title': {'text': color}} if color is not None else None,
+        'sliders': [{'active': 0, 'currentvalue': {'prefix': f'{frame}='}, 'pad': {'t': 50},
+                     'steps': [{'label': str(value), 'method': 'animate', 'args': [[str(value)], step_args]}
+                               for value in frame_values]}],
+        'updatemenus': [{'type': 'buttons', 'showactive': False, 'direction': 'left', 'x': 0.1, 'y': 0,
+                         'xanchor': 'right', 'yanchor': 'top', 'pad': {'r': 10, 't': 70},
+                         'buttons': [{'label': '&#9654;', 'method': 'animate', 'args': [None, play_args]},
+                                     {'label': '&#9724;', 'method': 'animate', 'args': [[None], step_args]}]}],
+    }
+    layout = {key: value for key, value in layout.items() if value is not None}
+    return go.Figure(data=base_traces, layout=layout, frames=frames)
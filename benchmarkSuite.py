@@ -0,0 +1,474 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Benchmark suite for the loading and cleaning stages of the workshop.
+
+Each stage runs the real code from the notebooks (the functions are
+pulled out of the scripts without running their top-level cells) on
+locally generated fixtures of a given size and dtype. For every stage the
+suite records wall time, peak RSS and Python allocations, and saves
+the results as JSON so two runs can be compared for regressions.
+
+Everything runs offline: fixtures are generated locally and the GitHub
+API used by pagination_demo is replaced by a small local HTTP server.
+
+Examples:
+
+    python benchmarkSuite.py --sizes 1000 10000 100000 --output bench.json
+    python benchmarkSuite.py --stages clean_data --compare bench.json
+"""
+
+import argparse
+import ast
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+DEFAULT_DTYPES = ['float64', 'float32']
+DEFAULT_REPEAT = 3
+
+# A stage is slower than its baseline when it takes this much longer
+REGRESSION_THRESHOLD = 0.10
+
+
+# Loading functions from the notebooks
+# =====================================
+
+def load_notebook_functions(filename, names, extra_globals=None):
+    """
+    Define selected functions from a notebook script without running it.
+
+    Only the imports, the named functions and the named top-level
+    assignments are executed, so cells that read files, call APIs or
+    show plots are skipped.
+
+    Returns:
+        namespace dict holding the requested names
+    """
+    path = os.path.join(REPO_DIR, filename)
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    wanted = set(names)
+    body = []
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            body.append(node)
+        elif isinstance(node, ast.FunctionDef) and node.name in wanted:
+            body.append(node)
+        elif isinstance(node, ast.Assign) and any(
+                isinstance(t, ast.Name) and t.id in wanted for t in node.targets):
+            body.append(node)
+
+    namespace = {'__name__': 'notebook_' + os.path.splitext(os.path.basename(filename))[0]}
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+    exec(compile(ast.Module(body=body, type_ignores=[]), path, 'exec'), namespace)
+    namespace.update(extra_globals or {})
+
+    missing = wanted - set(namespace)
+    if missing:
+        raise NameError(f"{filename} does not define {sorted(missing)}")
+    return namespace
+
+
+# Fixtures
+# =========
+
+def _tile(values, n_rows):
+    """Repeat a short list until it has n_rows items"""
+    return np.resize(np.asarray(values, dtype=object), n_rows)
+
+
+def make_messy_csv(path, n_rows):
+    """The messy CSV from create_sample_csv() in 1. CSVHandling.py, scaled up"""
+    pd.DataFrame({
+        'ID': _tile(['001', '002', 'N/A', '004', '005'], n_rows),
+        'Date': _tile(['2024-01-15', '1/16/24', 'unknown', '2024-01-17', '18-01-2024'], n_rows),
+        'Temperature': _tile(['22.5', 'NA', '25.3', '-999', '24.1'], n_rows),
+        'Category': _tile(['A', 'B', 'missing', 'D', 'E'], n_rows),
+        'Notes': _tile(['Good', 'Check,this', 'NA', 'Test"quote"', 'Fine'], n_rows),
+        'Value': _tile(['1,234.56', '2,345.67', 'unknown', '3,456.78', '4,567.89'], n_rows),
+    }).to_csv(path, index=False)
+
+
+def make_multi_sheet_excel(path, n_rows, dtype='float64'):
+    """The multi-region workbook from 2. ExcelHandling.py, scaled up"""
+    rng = np.random.default_rng(42)
+    df_sample = pd.DataFrame({
+        'Date': pd.date_range('2024-01-01', periods=n_rows, freq='min'),
+        'Product': _tile(['A', 'B', 'C'], n_rows),
+        'Sales': rng.integers(100, 1000, n_rows).astype(dtype),
+        'Region': _tile(['North', 'South', 'East', 'West'], n_rows),
+    })
+    with pd.ExcelWriter(path) as writer:
+        for region in ['North', 'South', 'East', 'West']:
+            df_sample[df_sample['Region'] == region].to_excel(writer, sheet_name=region, index=False)
+        summary = df_sample.groupby('Region')['Sales'].agg(['sum', 'mean', 'count'])
+        summary.to_excel(writer, sheet_name='Summary')
+
+
+def make_course_json(n_rows):
+    """The course submissions JSON from 3. JSONHandling.py with n_rows submissions"""
+    rng = np.random.default_rng(42)
+    per_week = 50
+    scores = rng.integers(50, 100, n_rows)
+    assignments = []
+    for week, start in enumerate(range(0, n_rows, per_week), 1):
+        assignments.append({
+            'week': week,
+            'submissions': [
+                {'student': f'Student{i % 500}', 'score': int(scores[i]), 'status': 'submitted'}
+                for i in range(start, min(start + per_week, n_rows))
+            ],
+        })
+    return {'course': {'id': 'CS101', 'title': 'Introduction to Programming',
+                       'assignments': assignments}}
+
+
+def make_missing_series(n_rows, dtype='float64', missing_fraction=0.1):
+    """numeric_normal from 9. MissingData.py: a block gap plus random gaps"""
+    rng = np.random.default_rng(42)
+    values = rng.normal(50, 15, n_rows)
+    values[rng.integers(0, n_rows, int(n_rows * missing_fraction))] = np.nan
+    values[n_rows // 100:n_rows // 100 + n_rows // 25] = np.nan
+    return pd.Series(values.astype(dtype), name='numeric_normal')
+
+
+class MockGitHubHandler(BaseHTTPRequestHandler):
+    """Serves /repos/<owner>/<repo>/issues pages like the GitHub API"""
+
+    items_per_page = 10
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        page = int(parse_qs(url.query).get('page', ['1'])[0])
+        if not url.path.endswith('/issues'):
+            self.send_response(404)
+            self.end_headers()
+            return
+        start = (page - 1) * self.items_per_page
+        issues = [{
+            'number': start + i,
+            'title': f'Issue {start + i}',
+            'state': 'open' if (start + i) % 3 else 'closed',
+            'comments': (start + i) % 7,
+            'created_at': '2024-01-01T00:00:00Z',
+            'body': 'Lorem ipsum ' * 20,
+        } for i in range(self.items_per_page)]
+        payload = json.dumps(issues).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mock_github_server(items_per_page):
+    """
+    Run the mock API on a free local port in a background thread.
+
+    Returns:
+        (server, base_url); call server.shutdown() when done
+    """
+    handler = type('Handler', (MockGitHubHandler,), {'items_per_page': items_per_page})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def _place_fixture(path, name):
+    """Make a fixture available under the file name the notebook expects"""
+    link = os.path.join(os.path.dirname(path), name)
+    if os.path.lexists(link):
+        os.remove(link)
+    try:
+        os.symlink(path, link)
+    except OSError:
+        shutil.copyfile(path, link)
+
+
+# Stages
+# =======
+# Each setup function prepares a stage in the fixture directory and
+# returns the callable to measure. Preparation is not timed.
+
+def setup_advanced_loading(fixture_dir, size, dtype):
+    path = os.path.join(fixture_dir, f'messy_data_{size}.csv')
+    if not os.path.exists(path):
+        make_messy_csv(path, size)
+    # The notebook reads 'messy_data.csv' from the working directory
+    _place_fixture(path, 'messy_data.csv')
+    ns = load_notebook_functions('1. CSVHandling.py', ['demonstrate_advanced_loading'])
+    return ns['demonstrate_advanced_loading']
+
+
+def setup_read_multiple_sheets(fixture_dir, size, dtype):
+    path = os.path.join(fixture_dir, f'multi_sheet_sales_{size}_{dtype}.xlsx')
+    if not os.path.exists(path):
+        make_multi_sheet_excel(path, size, dtype)
+    _place_fixture(path, 'multi_sheet_sales.xlsx')
+    ns = load_notebook_functions('2. ExcelHandling.py', ['read_multiple_sheets'])
+    return ns['read_multiple_sheets']
+
+
+def setup_json_normalize(fixture_dir, size, dtype):
+    from pandas import json_normalize
+    course_data = make_course_json(size)
+
+    def run():
+        # Same call as Part 3 of 3. JSONHandling.py
+        json_normalize(course_data['course']['assignments'], 'submissions', ['week'])
+    return run
+
+
+def setup_pagination_demo(fixture_dir, size, dtype):
+    # pagination_demo() always asks for 3 pages; the mock server returns
+    # size // 3 issues per page so the amount of data scales with size.
+    # The 1 second "be nice to the API" pause is skipped offline.
+    # The server lives as long as the worker process running this stage.
+    no_sleep = SimpleNamespace(sleep=lambda seconds: None)
+    _, base_url = start_mock_github_server(max(size // 3, 1))
+    ns = load_notebook_functions('4. APIs.py', ['pagination_demo'],
+                                 extra_globals={'BASE_URL': base_url, 'time': no_sleep})
+    return ns['pagination_demo']
+
+
+def setup_clean_data(fixture_dir, size, dtype):
+    from messyData import make_messy_data
+    df = make_messy_data(size).reset_index(drop=True)
+    df[['quantity', 'price']] = df[['quantity', 'price']].astype(dtype)
+    ns = load_notebook_functions('7. DataClean.py', ['clean_data'])
+
+    def run():
+        ns['clean_data'](df)
+    return run
+
+
+def make_imputation_setup(strategy):
+    def setup(fixture_dir, size, dtype):
+        from missingTools import ImputationComparison
+        series = make_missing_series(size, dtype)
+
+        def run():
+            ImputationComparison(series).imputed(strategy)
+        return run
+    return setup
+
+
+STAGES = {
+    'advanced_loading': {'setup': setup_advanced_loading, 'dtypes': False},
+    'read_multiple_sheets': {'setup': setup_read_multiple_sheets, 'dtypes': True},
+    'json_normalize': {'setup': setup_json_normalize, 'dtypes': False},
+    'pagination_demo': {'setup': setup_pagination_demo, 'dtypes': False},
+    'clean_data': {'setup': setup_clean_data, 'dtypes': True},
+}
+for _strategy in ['mean', 'median', 'mode', 'constant', 'ffill', 'bfill',
+                  'linear', 'polynomial', 'nearest']:
+    STAGES[f'impute_{_strategy}'] = {'setup': make_imputation_setup(_strategy), 'dtypes': True}
+
+
+# Measuring
+# ==========
+
+def _status_mb(field):
+    """A memory field of /proc/self/status (VmRSS, VmHWM) in MB, or None off Linux"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss():
+    """Start a new peak RSS (VmHWM) from the current RSS; False where the OS doesn't allow it"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process so far, in MB"""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def _measure_case(case):
+    """Run one (stage, size, dtype) case; executed in a fresh worker process"""
+    stage, size, dtype, repeat, fixture_dir = case
+    os.chdir(fixture_dir)
+    sink = io.StringIO()
+    with contextlib.redirect_stdout(sink):
+        run = STAGES[stage]['setup'](fixture_dir, size, dtype)
+        # The peak is restarted after setup, so loading the fixtures doesn't count towards it
+        stage_peak = _reset_peak_rss()
+        rss_before = _status_mb('VmRSS') if stage_peak else _peak_rss_mb()
+
+        # 1. Wall time (tracemalloc off, so it doesn't slow things down)
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+        rss_after = _status_mb('VmHWM') if stage_peak else _peak_rss_mb()
+
+        # 2. Allocations, in a separate traced run: the most memory the stage's own allocations
+        #    held at once (temporaries freed before the end count too), and what it kept
+        tracemalloc.start()
+        start_bytes, _ = tracemalloc.get_traced_memory()
+        run()
+        end_bytes, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        'stage': stage,
+        'size': size,
+        'dtype': dtype,
+        'repeat': repeat,
+        'wall_s_median': statistics.median(times),
+        'wall_s_min': min(times),
+        # Peak RSS while the stage ran (Linux; elsewhere the process's lifetime peak, setup included)
+        'peak_rss_mb': rss_after,
+        'peak_rss_delta_mb': max(rss_after - rss_before, 0.0),
+        'peak_rss_per_stage': stage_peak,
+        'alloc_peak_mb': (traced_peak - start_bytes) / 1024 ** 2,
+        'retained_mb': (end_bytes - start_bytes) / 1024 ** 2,
+    }
+
+
+def run_benchmarks(stages=None, sizes=None, dtypes=None, repeat=DEFAULT_REPEAT,
+                   fixture_dir=None):
+    """
+    Run every requested (stage, size, dtype) case and return the results.
+
+    Each case runs in its own worker process, and its peak RSS is restarted
+    after the fixtures are set up, so the peak belongs to the stage alone.
+    Stages that don't depend on dtype run once per size.
+    """
+    stages = stages or list(STAGES)
+    sizes = sizes or DEFAULT_SIZES
+    dtypes = dtypes or DEFAULT_DTYPES
+    fixture_dir = fixture_dir or tempfile.mkdtemp(prefix='workshop_bench_')
+    os.makedirs(fixture_dir, exist_ok=True)
+
+    cases = []
+    for stage in stages:
+        stage_dtypes = dtypes if STAGES[stage]['dtypes'] else ['default']
+        for size in sizes:
+            for dtype in stage_dtypes:
+                cases.append((stage, size, dtype if dtype != 'default' else 'float64',
+                              repeat, fixture_dir))
+
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for case in cases:
+        with context.Pool(1) as pool:
+            result = pool.apply(_measure_case, (case,))
+        if not STAGES[case[0]]['dtypes']:
+            result['dtype'] = 'default'
+        print(f"{result['stage']:<22} size={result['size']:<10} dtype={result['dtype']:<8} "
+              f"{result['wall_s_median']:.4f}s  rss=+{result['peak_rss_delta_mb']:.0f}MB  "
+              f"alloc={result['alloc_peak_mb']:.1f}MB")
+        results.append(result)
+
+    return {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'results': results,
+    }
+
+
+def save_results(results, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare_results(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """
+    Compare two result sets case by case.
+
+    Returns a DataFrame with the baseline and current best wall time
+    (the minimum is the least noisy), their ratio and a 'regression' flag
+    for cases slower than the threshold allows.
+    """
+    key = ['stage', 'size', 'dtype']
+    columns = key + ['wall_s_min', 'peak_rss_delta_mb', 'alloc_peak_mb']
+    # reindex: baselines saved by older versions lack some of the memory columns
+    old = pd.DataFrame(baseline['results']).reindex(columns=columns)
+    new = pd.DataFrame(current['results']).reindex(columns=columns)
+    merged = old.merge(new, on=key, suffixes=('_baseline', '_current'))
+    merged['time_ratio'] = merged['wall_s_min_current'] / merged['wall_s_min_baseline']
+    merged['regression'] = merged['time_ratio'] > 1 + threshold
+    return merged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), help='stages to run (default: all)')
+    parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES)
+    parser.add_argument('--dtypes', nargs='+', default=DEFAULT_DTYPES)
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--fixtures', help='directory for generated fixtures (default: temp dir)')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help='baseline JSON file to compare against')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.stages, args.sizes, args.dtypes, args.repeat, args.fixtures)
+    save_results(results, args.output)
+    print(f"\nSaved results to {args.output}")
+
+    if args.compare:
+        comparison = compare_results(load_results(args.compare), results)
+        print("\nComparison with baseline:")
+        print(comparison[['stage', 'size', 'dtype', 'wall_s_min_baseline',
+                          'wall_s_min_current', 'time_ratio', 'regression']].to_string(index=False))
+        if comparison['regression'].any():
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Reusable helpers for the data cleaning notebooks.
+
+The notebooks (e.g. 7. DataClean.py) demonstrate each cleaning issue on a
+small toy frame. The functions here do the same jobs in a vectorized way so
+they keep working when the frames grow to millions of rows.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Default sentinel strings found in inventory-style columns
+DEFAULT_SENTINELS = {
+    'out_of_stock': 'out_of_stock',
+    'back_ordered': 'back_ordered',
+}
+
+
+# Mixed Data Types
+# =================
+
+def split_sentinel_column(series, sentinels=None):
+    """
+    Split a mixed numbers-as-strings column into numbers and a status code.
+
+    Instead of trying float() on every element, the column is factorized once
+    and only the unique values are parsed. The result for each unique value is
+    then broadcast back to every row through the factorized codes.
+
+    Parameters:
+        series: column holding numbers, numeric strings and sentinel strings
+        sentinels: list of sentinel strings, or dict mapping sentinel -> status
+
+    Returns:
+        (values, status) where values is a float64 array (NaN where no number)
+        and status is a Categorical with 'ok', 'missing', 'invalid' and one
+        category per sentinel status.
+    """
+    if sentinels is None:
+        sentinels = DEFAULT_SENTINELS
+    elif not isinstance(sentinels, dict):
+        sentinels = {s: s for s in sentinels}
+
+    # 1. Factorize: one hashing pass, NaN/None get code -1
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    uniques = pd.Index(uniques, dtype=object)
+
+    # 2. Parse only the unique values
+    unique_values = pd.to_numeric(
+        pd.Series(uniques.astype(str)).str.strip(), errors='coerce'
+    ).to_numpy(dtype='float64', copy=True)
+
+    # 3. Work out the status of each unique value
+    status_labels = ['ok', 'missing', 'invalid']
+    status_labels += [s for s in sorted(set(sentinels.values())) if s not in status_labels]
+    status_lookup = {label: i for i, label in enumerate(status_labels)}
+    sentinel_codes = pd.Series(uniques.map(lambda v: sentinels.get(v)))
+
+    unique_status = np.where(np.isnan(unique_values),
+                             status_lookup['invalid'],
+                             status_lookup['ok']).astype('int8')
+    is_sentinel = sentinel_codes.notna().to_numpy()
+    unique_status[is_sentinel] = sentinel_codes[is_sentinel].map(status_lookup).to_numpy()
+    unique_values[is_sentinel] = np.nan
+
+    # 4. Broadcast back to rows (code -1 means the original value was missing)
+    missing = codes < 0
+    safe_codes = np.where(missing, 0, codes)
+    if len(uniques):
+        values = unique_values[safe_codes]
+        status_codes = unique_status[safe_codes]
+    else:
+        values = np.full(len(codes), np.nan)
+        status_codes = np.zeros(len(codes), dtype='int8')
+    values[missing] = np.nan
+    status_codes[missing] = status_lookup['missing']
+
+    status = pd.Categorical.from_codes(status_codes, categories=status_labels)
+    return values, status
+
+
+# Incorrect Values
+# =================
+
+# Rule types understood by validate_rules(). Each rule is a plain dict, e.g.
+#   {'name': 'negative_quantities', 'type': 'range', 'column': 'quantity', 'min': 0}
+#   {'name': 'zero_prices', 'type': 'not_equal', 'column': 'price', 'value': 0}
+#   {'name': 'unknown_stores', 'type': 'allowed', 'column': 'store_id',
+#    'values': ['S01', 'S02', 'S03', 'S04']}
+#   {'name': 'bad_product_ids', 'type': 'regex', 'column': 'productid',
+#    'pattern': r'PROD\d{3}'}
+#   {'name': 'price_below_cost', 'type': 'compare', 'column': 'price',
+#    'op': '>=', 'other': 'cost'}
+RULE_TYPES = ['range', 'not_equal', 'allowed', 'regex', 'compare']
+
+COMPARE_OPS = {
+    '<': np.less,
+    '<=': np.less_equal,
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '==': np.equal,
+    '!=': np.not_equal,
+}
+
+
+class ValidationReport:
+    """
+    Result of validate_rules(): one packed violation bitmap per rule.
+
+    Rows are never copied. Use counts for the summary, rows(name) for the
+    positions of violating rows and mask(name) for a boolean mask.
+    """
+
+    def __init__(self, names, bitmaps, counts, n_rows, index):
+        self.names = list(names)
+        self.bitmaps = bitmaps      # shape (n_rules, ceil(n_rows / 8)), uint8
+        self.counts = pd.Series(counts, index=self.names, name='violations')
+        self.n_rows = n_rows
+        self.index = index
+
+    def mask(self, name):
+        """Boolean violation mask for one rule"""
+        i = self.names.index(name)
+        return np.unpackbits(self.bitmaps[i], count=self.n_rows).astype(bool)
+
+    def rows(self, name):
+        """Integer positions of the rows that break one rule"""
+        return np.flatnonzero(self.mask(name))
+
+    def labels(self, name):
+        """Index labels of the rows that break one rule"""
+        return self.index[self.rows(name)]
+
+    def any_violation(self):
+        """Boolean mask of rows that break at least one rule"""
+        combined = np.bitwise_or.reduce(self.bitmaps, axis=0)
+        return np.unpackbits(combined, count=self.n_rows).astype(bool)
+
+    def to_dict(self):
+        """Violation counts as a plain {rule name: count} dict"""
+        return {name: int(count) for name, count in self.counts.items()}
+
+
+def _unique_check(column_cache, column, check):
+    """Run check() on the unique values of a column and broadcast to rows"""
+    codes, uniques = column_cache[column]
+    unique_bad = np.asarray(check(uniques), dtype=bool)
+    # Missing values (code -1) are not treated as violations here
+    bad = np.zeros(len(codes), dtype=bool)
+    present = codes >= 0
+    bad[present] = unique_bad[codes[present]]
+    return bad
+
+
+def _rule_mask(df, rule, value_cache, column_cache):
+    """Compile one rule into a boolean violation mask"""
+    kind = rule['type']
+    column = rule['column']
+
+    if kind in ('allowed', 'regex'):
+        if column not in column_cache:
+            column_cache[column] = pd.factorize(df[column], use_na_sentinel=True)
+        if kind == 'allowed':
+            allowed = pd.Index(list(rule['values']))
+            return _unique_check(column_cache, column,
+                                 lambda uniques: ~pd.Index(uniques).isin(allowed))
+        pattern = rule['pattern']
+        return _unique_check(column_cache, column,
+                             lambda uniques: ~pd.Series(uniques, dtype=object)
+                             .astype(str).str.fullmatch(pattern).to_numpy(dtype=bool))
+
+    if column not in value_cache:
+        value_cache[column] = df[column].to_numpy()
+    values = value_cache[column]
+
+    if kind == 'range':
+        bad = np.zeros(len(values), dtype=bool)
+        if rule.get('min') is not None:
+            bad |= values < rule['min']
+        if rule.get('max') is not None:
+            bad |= values > rule['max']
+        return bad
+    if kind == 'not_equal':
+        return values == rule['value']
+    if kind == 'compare':
+        other = rule['other']
+        if other not in value_cache:
+            value_cache[other] = df[other].to_numpy()
+        # The rule states what must hold, so a violation is where it fails
+        with np.errstate(invalid='ignore'):
+            holds = COMPARE_OPS[rule['op']](values, value_cache[other])
+        both_present = pd.notna(values) & pd.notna(value_cache[other])
+        return ~holds & both_present
+
+    raise ValueError(f"Unknown rule type '{kind}'. Expected one of {RULE_TYPES}")
+
+
+def validate_rules(df, rules):
+    """
+    Check many declarative rules against a DataFrame in one batched pass.
+
+    Each column is pulled out of the frame once and shared by every rule on
+    it; set and regex rules are evaluated on the unique values only. Every
+    rule becomes one bit-packed row of a violation bitmap.
+
+    Parameters:
+        df: DataFrame to validate
+        rules: list of rule dicts (see RULE_TYPES above)
+
+    Returns:
+        ValidationReport with counts, row positions and masks per rule
+    """
+    n_rows = len(df)
+    value_cache = {}
+    column_cache = {}
+    names = []
+    bitmaps = np.zeros((len(rules), (n_rows + 7) // 8), dtype=np.uint8)
+    counts = np.zeros(len(rules), dtype=np.int64)
+
+    for i, rule in enumerate(rules):
+        names.append(rule.get('name', f"{rule['column']}_{rule['type']}"))
+        bad = np.asarray(_rule_mask(df, rule, value_cache, column_cache), dtype=bool)
+        counts[i] = np.count_nonzero(bad)
+        bitmaps[i] = np.packbits(bad)
+
+    return ValidationReport(names, bitmaps, counts, n_rows, df.index)
+
+
+if __name__ == '__main__':
+    import time
+
+    # Quick demo on the same kind of column used in 7. DataClean.py
+    n_rows = 10_000_000
+    raw = np.random.randint(1, 100, n_rows).astype(str).astype(object)
+    raw[200::1000] = 'out_of_stock'
+    raw[300::1000] = 'back_ordered'
+    mixed = pd.Series(raw)
+
+    start = time.perf_counter()
+    values, status = split_sentinel_column(mixed)
+    elapsed = time.perf_counter() - start
+
+    print(f"Split {n_rows:,} rows in {elapsed:.2f} seconds")
+    print(pd.Series(status).value_counts())
+    print(f"Mean of numeric part: {np.nanmean(values):.2f}")
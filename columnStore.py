@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Memory-mapped columnar storage for intermediate datasets.
+
+The scripts hand data between steps as in-memory frames (df_sample to the
+Excel writers, sheets_dict to create_formatted_excel) and re-read CSV or
+XLSX files on every run. A ColumnStore writes a frame once as one .npy file
+per column and maps it back with np.load(mmap_mode='c'):
+
+    - numeric, boolean and datetime columns come back without copying;
+      pages are read from disk only when touched
+    - the maps are copy-on-write: the frames can be edited in place like
+      any other (df.loc[0, 'Sales'] = 5), the edited pages are copied in
+      memory and the stored files never change
+    - several worker processes reading the same dataset share one physical
+      copy through the OS page cache (pass a StoredFrame handle, not the data)
+    - string and other object columns are stored dictionary-encoded
+      (integer codes .npy + the unique values); the codes are mapped, the
+      strings are rebuilt on read (or kept as a Categorical)
+
+    store = ColumnStore('.column_store')
+    store.write('sales', df)
+    df = store.read('sales')                      # memory-mapped
+    sheets = store.read_through('sheets', lambda: pd.read_excel(path, sheet_name=None),
+                                source=path)      # parsed once per change of path
+
+A dict of DataFrames (like pd.read_excel(..., sheet_name=None) returns) is
+stored as one entry per key and read back as a dict.
+"""
+
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import warnings
+
+import numpy as np
+import pandas as pd
+
+MANIFEST = 'manifest.json'
+
+
+# Encoding columns
+# =================
+
+def _write_column(directory, i, series):
+    """Write one column, return its manifest entry"""
+    dtype = series.dtype
+    entry = {'dtype': str(dtype)}
+    if isinstance(dtype, pd.CategoricalDtype):
+        entry['encoding'] = 'category'
+        np.save(os.path.join(directory, f'{i}.npy'), series.cat.codes.to_numpy())
+        with open(os.path.join(directory, f'{i}.values.pkl'), 'wb') as f:
+            pickle.dump((series.cat.categories, dtype.ordered), f, protocol=pickle.HIGHEST_PROTOCOL)
+    elif isinstance(dtype, np.dtype) and dtype.kind in 'biufcmM':
+        entry['encoding'] = 'array'
+        np.save(os.path.join(directory, f'{i}.npy'), series.to_numpy())
+    elif dtype == object or isinstance(dtype, pd.StringDtype):
+        # Dictionary encoding: the codes are fixed width and can be mapped
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        missing = series[codes < 0]
+        entry['encoding'] = 'dictionary'
+        np.save(os.path.join(directory, f'{i}.npy'), codes.astype('int32' if len(uniques) < 2**31 else 'int64'))
+        with open(os.path.join(directory, f'{i}.values.pkl'), 'wb') as f:
+            pickle.dump((np.asarray(uniques, dtype=object),
+                         missing.iloc[0] if len(missing) else None), f, protocol=pickle.HIGHEST_PROTOCOL)
+    else:
+        # Extension dtypes (nullable integers, intervals, ...) are pickled whole
+        entry['encoding'] = 'pickle'
+        series.to_pickle(os.path.join(directory, f'{i}.pkl'))
+    return entry
+
+
+def _read_column(directory, i, entry, strings):
+    encoding = entry['encoding']
+    if encoding == 'pickle':
+        return pd.read_pickle(os.path.join(directory, f'{i}.pkl')).array
+    # Copy-on-write, so in-place edits of the returned frame work and stay out of the files
+    codes = np.load(os.path.join(directory, f'{i}.npy'), mmap_mode='c')
+    if encoding == 'array':
+        return codes
+    with open(os.path.join(directory, f'{i}.values.pkl'), 'rb') as f:
+        values, extra = pickle.load(f)
+    if encoding == 'category':
+        return pd.Categorical.from_codes(codes, categories=values, ordered=extra)
+    if strings == 'category':
+        return pd.Categorical.from_codes(codes, categories=values)
+    # Rebuild the original column: one take() over the unique values
+    rebuilt = np.append(values, np.array([extra], dtype=object)).take(codes)
+    return pd.array(rebuilt, dtype=entry['dtype']) if entry['dtype'] != 'object' else rebuilt
+
+
+def _write_frame(directory, df):
+    os.makedirs(directory, exist_ok=True)
+    columns = [_write_column(directory, i, df.iloc[:, i]) for i in range(df.shape[1])]
+    manifest = {'kind': 'frame', 'rows': len(df), 'columns': columns, 'index_name': df.index.name}
+    if isinstance(df.index, pd.RangeIndex):
+        manifest['range'] = [df.index.start, df.index.stop, df.index.step]
+    else:
+        manifest['index'] = _write_column(directory, 'index', df.index.to_series())
+    with open(os.path.join(directory, 'columns.pkl'), 'wb') as f:
+        # Column labels can be any hashable, so they are pickled rather than put in JSON
+        pickle.dump(df.columns, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return manifest
+
+
+def _read_frame(directory, manifest, columns, strings):
+    with open(os.path.join(directory, 'columns.pkl'), 'rb') as f:
+        labels = pickle.load(f)
+    positions = range(len(labels)) if columns is None else [labels.get_loc(c) for c in columns]
+    # Positions as keys so duplicate labels survive; the labels are put back after
+    data = {i: _read_column(directory, i, manifest['columns'][i], strings) for i in positions}
+    if 'range' in manifest:
+        index = pd.RangeIndex(*manifest['range'], name=manifest['index_name'])
+    else:
+        index = pd.Index(_read_column(directory, 'index', manifest['index'], None), name=manifest['index_name'])
+    # A dict with copy=False gives every column its own block: same-dtype columns are not
+    # consolidated into one 2-D block, which would copy them all into memory
+    df = pd.DataFrame(data, index=index, copy=False)
+    df.columns = labels[list(positions)]
+    mapped = [i for i, values in zip(range(df.shape[1]), data.values()) if _is_mapped(values)]
+    copied = [df.columns[i] for i in mapped if not _is_mapped(df.iloc[:, i].array)]
+    if copied:
+        warnings.warn(f"pandas {pd.__version__} copied the mapped columns {copied} into memory",
+                      RuntimeWarning, stacklevel=3)
+    return df
+
+
+def _is_mapped(values):
+    """Whether an array (or a Categorical's codes) is a view of a memory map"""
+    values = getattr(values, 'codes', values)
+    values = getattr(values, '_ndarray', values)
+    while isinstance(values, np.ndarray):
+        if isinstance(values, np.memmap):
+            return True
+        values = values.base
+    return isinstance(values, np.memmap)
+
+
+def mapped_columns(df):
+    """Labels of the columns of df that are still backed by a ColumnStore memory map"""
+    return [label for i, label in enumerate(df.columns) if _is_mapped(df.iloc[:, i].array)]
+
+
+# Store
+# ======
+
+class StoredFrame:
+    """
+    Picklable handle to an entry of a ColumnStore.
+
+    Send this to worker processes instead of the data; each worker maps the
+    same files, so the dataset is held in memory only once.
+    """
+
+    def __init__(self, root, name):
+        self.root = root
+        self.name = name
+
+    def load(self, columns=None, strings='object'):
+        return ColumnStore(self.root).read(self.name, columns=columns, strings=strings)
+
+    def __repr__(self):
+        return f'StoredFrame({self.root!r}, {self.name!r})'
+
+
+class ColumnStore:
+    """
+    Directory of memory-mapped datasets, one subdirectory per name.
+
+    Parameters:
+        root: directory holding the datasets (created when needed)
+    """
+
+    def __init__(self, root='.column_store'):
+        self.root = root
+
+    def _directory(self, name):
+        return os.path.join(self.root, *name.split('/'))
+
+    def _manifest(self, name):
+        try:
+            with open(os.path.join(self._directory(name), MANIFEST)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def exists(self, name):
+        return self._manifest(name) is not None
+
+    def names(self):
+        """Names of the stored datasets"""
+        found = []
+        for directory, subdirectories, files in os.walk(self.root):
+            if MANIFEST in files:
+                found.append(os.path.relpath(directory, self.root).replace(os.sep, '/'))
+                subdirectories[:] = []
+        return sorted(found)
+
+    def write(self, name, data, source=None):
+        """
+        Store a DataFrame, Series or dict of DataFrames under name.
+
+        source is an optional file the data was read from; read_through()
+        uses its size and modification time to notice changes.
+        """
+        if isinstance(data, pd.Series):
+            data = data.to_frame()
+        os.makedirs(self.root, exist_ok=True)
+        # Build in a temporary directory and swap it in, so readers never see half a dataset
+        tmp = tempfile.mkdtemp(prefix='.tmp_', dir=self.root)
+        try:
+            if isinstance(data, dict):
+                keys = list(data)
+                for i, key in enumerate(keys):
+                    part = _write_frame(os.path.join(tmp, str(i)), data[key])
+                    with open(os.path.join(tmp, str(i), MANIFEST), 'w') as f:
+                        json.dump(part, f)
+                with open(os.path.join(tmp, 'keys.pkl'), 'wb') as f:
+                    pickle.dump(keys, f, protocol=pickle.HIGHEST_PROTOCOL)
+                manifest = {'kind': 'dict', 'count': len(keys)}
+            else:
+                manifest = _write_frame(tmp, data)
+            manifest['source'] = _source_signature(source)
+            with open(os.path.join(tmp, MANIFEST), 'w') as f:
+                json.dump(manifest, f)
+            directory = self._directory(name)
+            if os.path.exists(directory):
+                shutil.rmtree(directory)
+            os.makedirs(os.path.dirname(directory), exist_ok=True)
+            os.replace(tmp, directory)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        return StoredFrame(self.root, name)
+
+    def read(self, name, columns=None, strings='object'):
+        """
+        Map a stored dataset back.
+
+        columns: only map these columns (frames only)
+        strings: 'object' rebuilds string columns as stored, 'category'
+                 returns them as Categoricals over the mapped codes (no copy)
+        """
+        manifest = self._manifest(name)
+        if manifest is None:
+            raise KeyError(f"No dataset named '{name}' in {self.root}")
+        directory = self._directory(name)
+        if manifest['kind'] == 'dict':
+            with open(os.path.join(directory, 'keys.pkl'), 'rb') as f:
+                keys = pickle.load(f)
+            frames = {}
+            for i, key in enumerate(keys):
+                with open(os.path.join(directory, str(i), MANIFEST)) as f:
+                    frames[key] = _read_frame(os.path.join(directory, str(i)), json.load(f), columns, strings)
+            return frames
+        return _read_frame(directory, manifest, columns, strings)
+
+    def read_through(self, name, loader, source=None, **read_kwargs):
+        """
+        read(name), or loader() written to the store first when the entry is
+        missing or its source file has changed since it was written.
+        """
+        manifest = self._manifest(name)
+        if manifest is None or (source is not None and manifest.get('source') != _source_signature(source)):
+            self.write(name, loader(), source=source)
+        return self.read(name, **read_kwargs)
+
+    def handle(self, name):
+        return StoredFrame(self.root, name)
+
+    def delete(self, name):
+        shutil.rmtree(self._directory(name), ignore_errors=True)
+
+
+def _source_signature(path):
+    if path is None:
+        return None
+    stat = os.stat(path)
+    return [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
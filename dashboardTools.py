@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Helpers for building plotly dashboards like 10_allTogether.py.
+
+fig.add_trace(..., row=, col=) and fig.add_annotation(..., row=, col=) each
+validate the new object and rebuild the figure's layout, so a panel with
+hundreds of annotations gets slower with every label. DashboardBuilder
+collects traces, annotations, shapes and axis updates as plain dicts,
+works out each subplot's axis references once, and builds the figure in a
+single go.Figure(...) call.
+
+    builder = DashboardBuilder(rows=2, cols=2, subplot_titles=[...])
+    builder.add_trace(go.Bar(x=..., y=...), row=1, col=1)
+    builder.add_annotations([dict(text=..., x=..., y=...), ...], row=1, col=1)
+    builder.update_yaxes(range=[0, 10], row=1, col=1)
+    fig = builder.build()
+
+SVG scatter traces get slow past roughly ten thousand points. build()
+switches every scatter trace of a subplot to WebGL (scattergl) once the
+subplot holds more than webgl_threshold points; styling, per-category
+traces and dashed lines carry over unchanged. render_mode() makes the same
+choice for plotly express.
+"""
+
+import copy
+
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+# Points per subplot above which scatter traces are drawn with WebGL
+WEBGL_THRESHOLD = 10_000
+
+# Scatter properties WebGL ignores; they are dropped when switching
+_WEBGL_DROPPED = ('alignmentgroup', 'cliponaxis', 'hoveron', 'offsetgroup', 'orientation', 'zorder')
+
+
+def _merge(target, updates):
+    """Recursively merge updates into target (dicts are merged, everything else replaced)"""
+    for key, value in updates.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            target[key] = value
+    return target
+
+
+def render_mode(n_points, threshold=WEBGL_THRESHOLD):
+    """render_mode for px.scatter/px.line: 'webgl' above threshold points, else 'svg'"""
+    return 'webgl' if threshold is not None and n_points > threshold else 'svg'
+
+
+def _n_points(trace):
+    for axis in ('x', 'y'):
+        values = trace.get(axis)
+        if values is not None and hasattr(values, '__len__'):
+            return len(values)
+    return 0
+
+
+def webgl_compatible(trace):
+    """Whether a scatter trace dict looks the same when drawn as scattergl"""
+    if trace.get('type', 'scatter') != 'scatter':
+        return False
+    if any(key in trace for key in ('stackgroup', 'groupnorm', 'stackgaps', 'fillgradient', 'fillpattern')):
+        return False
+    marker, line = trace.get('marker', {}), trace.get('line', {})
+    if any(key in marker for key in ('gradient', 'maxdisplayed', 'angleref', 'standoff')):
+        return False
+    return line.get('shape') != 'spline' and 'smoothing' not in line and 'backoff' not in line
+
+
+def to_webgl(trace):
+    """Copy of a scatter trace dict as a scattergl trace"""
+    trace = {key: value for key, value in trace.items() if key not in _WEBGL_DROPPED}
+    trace['type'] = 'scattergl'
+    return trace
+
+
+class DashboardBuilder:
+    """
+    Collect the pieces of a subplot figure and build it in one step.
+
+    Takes the same arguments as plotly.subplots.make_subplots. The grid is
+    laid out once; builder.layout is its layout as a plain dict, so the
+    subplot title annotations (builder.layout['annotations']) can be edited
+    before build().
+
+    webgl_threshold: points per subplot above which its scatter traces are
+    built as scattergl (None keeps SVG everywhere)
+    """
+
+    def __init__(self, rows=1, cols=1, webgl_threshold=WEBGL_THRESHOLD, **subplot_kwargs):
+        self.rows, self.cols = rows, cols
+        self.webgl_threshold = webgl_threshold
+        self._grid = make_subplots(rows=rows, cols=cols, **subplot_kwargs)
+        self.layout = self._grid.layout.to_plotly_json()
+        # go.Figure applies the default template itself; update_layout(template=...) replaces it
+        self.layout.pop('template', None)
+        self.layout.setdefault('annotations', [])
+        self.traces = []
+        self.annotations = []
+        self.shapes = []
+        self._axis_updates = []
+        self._layout_updates = []
+        self._refs = {}
+
+    # Axis references
+
+    def axis_refs(self, row, col):
+        """('x3', 'y3') style references of a subplot, resolved once per cell"""
+        if (row, col) not in self._refs:
+            subplot = self._grid.get_subplot(row, col)
+            self._refs[(row, col)] = ('x' + subplot.xaxis.plotly_name[len('xaxis'):],
+                                      'y' + subplot.yaxis.plotly_name[len('yaxis'):])
+        return self._refs[(row, col)]
+
+    def _axis_names(self, axis, row, col):
+        rows = range(1, self.rows + 1) if row is None else [row]
+        cols = range(1, self.cols + 1) if col is None else [col]
+        names = []
+        for r in rows:
+            for c in cols:
+                if self._grid.get_subplot(r, c) is None:
+                    continue
+                ref = self.axis_refs(r, c)[0 if axis == 'x' else 1]
+                names.append(axis + 'axis' + ref[1:])
+        return names
+
+    # Collecting
+
+    def add_trace(self, trace, row=None, col=None):
+        """Add a go trace or a trace dict (with a 'type' key) to a subplot"""
+        trace = trace.to_plotly_json() if hasattr(trace, 'to_plotly_json') else dict(trace)
+        if row is not None:
+            trace['xaxis'], trace['yaxis'] = self.axis_refs(row, col)
+        self.traces.append(trace)
+        return self
+
+    def add_traces(self, traces, row=None, col=None):
+        for trace in traces:
+            self.add_trace(trace, row, col)
+        return self
+
+    def add_annotation(self, row=None, col=None, **annotation):
+        """Annotation in data coordinates of a subplot, or in paper coordinates without row/col"""
+        return self.add_annotations([annotation], row, col)
+
+    def add_annotations(self, annotations, row=None, col=None):
+        """Add many annotation dicts at once; subplot references are filled in where missing"""
+        if row is None:
+            self.annotations.extend(dict(a) for a in annotations)
+            return self
+        xref, yref = self.axis_refs(row, col)
+        for annotation in annotations:
+            annotation = dict(annotation)
+            annotation.setdefault('xref', xref)
+            annotation.setdefault('yref', yref)
+            self.annotations.append(annotation)
+        return self
+
+    def add_shape(self, row=None, col=None, **shape):
+        shape = go.layout.Shape(**shape).to_plotly_json()
+        if row is not None:
+            xref, yref = self.axis_refs(row, col)
+            shape.setdefault('xref', xref)
+            shape.setdefault('yref', yref)
+        self.shapes.append(shape)
+        return self
+
+    def add_vline(self, x, row=None, col=None, **line):
+        """Vertical line spanning the whole height of a subplot (like fig.add_vline)"""
+        yref = self.axis_refs(row, col)[1] + ' domain' if row is not None else 'paper'
+        return self.add_shape(row, col, type='line', x0=x, x1=x, y0=0, y1=1, yref=yref, **line)
+
+    def add_hline(self, y, row=None, col=None, **line):
+        xref = self.axis_refs(row, col)[0] + ' domain' if row is not None else 'paper'
+        return self.add_shape(row, col, type='line', x0=0, x1=1, y0=y, y1=y, xref=xref, **line)
+
+    def update_xaxes(self, row=None, col=None, **props):
+        """Update the x axis of one subplot, or of all subplots in a row/column when omitted"""
+        # Normalized once here, so 'title_font' style keys merge like nested dicts
+        props = go.layout.XAxis(**props).to_plotly_json()
+        self._axis_updates += [(name, props) for name in self._axis_names('x', row, col)]
+        return self
+
+    def update_yaxes(self, row=None, col=None, **props):
+        props = go.layout.YAxis(**props).to_plotly_json()
+        self._axis_updates += [(name, props) for name in self._axis_names('y', row, col)]
+        return self
+
+    def update_layout(self, **props):
+        self._layout_updates.append(go.Layout(**props).to_plotly_json())
+        return self
+
+    # Building
+
+    def _traces(self):
+        """The traces, with the scatter traces of crowded subplots switched to WebGL"""
+        if self.webgl_threshold is None:
+            return self.traces
+        counts = {}
+        for trace in self.traces:
+            if trace.get('type', 'scatter') in ('scatter', 'scattergl'):
+                cell = (trace.get('xaxis', 'x'), trace.get('yaxis', 'y'))
+                counts[cell] = counts.get(cell, 0) + _n_points(trace)
+        crowded = {cell for cell, n in counts.items() if n > self.webgl_threshold}
+        # The whole subplot switches at once, so trace order (and which trace draws on top) is kept
+        return [to_webgl(trace) if (trace.get('xaxis', 'x'), trace.get('yaxis', 'y')) in crowded
+                and webgl_compatible(trace) else trace for trace in self.traces]
+
+    def build(self):
+        """The finished go.Figure, validated once"""
+        layout = copy.deepcopy(self.layout)
+        layout['annotations'] = layout['annotations'] + self.annotations
+        layout['shapes'] = layout.get('shapes', []) + self.shapes
+        for name, props in self._axis_updates:
+            _merge(layout.setdefault(name, {}), copy.deepcopy(props))
+        for props in self._layout_updates:
+            props = copy.deepcopy(props)
+            if 'template' in props:
+                layout['template'] = props.pop('template')
+            _merge(layout, props)
+        return go.Figure(data=self._traces(), layout=layout)
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Compact HTML export for plotly figures.
+
+fig.write_html() and fig.show() embed the whole plotly.js bundle (about
+4.5 MB) in every file, and numbers passed as Python lists are written out
+as JSON text. export_figures() writes many figures into one directory
+that share a single local copy of plotly.js:
+
+    export_figures({'temperature': fig1, 'dashboard': fig2}, 'figures')
+    # figures/plotly-<version>.min.js, figures/temperature.html, figures/dashboard.html
+
+Numeric arrays of the traces are written as base64 typed arrays (which
+plotly.js decodes straight into a Float64Array/Int32Array/...) whenever
+that is smaller than their JSON text, and the JSON is produced with orjson
+when it is installed.
+
+The scripts call show(fig, name): it is fig.show() unless the environment
+variable FIGURE_EXPORT names a directory, in which case the figure is
+written there instead:
+
+    FIGURE_EXPORT=figures python 07_firstPlotly.py
+"""
+
+import base64
+import os
+import time
+import uuid
+
+import numpy as np
+import plotly
+import plotly.io as pio
+from plotly.basedatatypes import BaseFigure
+from plotly.offline import get_plotlyjs, get_plotlyjs_version
+
+# Numeric lists shorter than this stay JSON text (base64 only pays off for longer arrays)
+MIN_TYPED_LENGTH = 16
+
+# Keys plotly itself never turns into typed arrays
+_SKIPPED_KEYS = ('geojson', 'layer', 'layers', 'range')
+
+# Adds the frames of an animation after the first frame is drawn, FRAME_BATCH at a time
+FRAME_BATCH = 50
+LAZY_FRAMES_SCRIPT = """
+var gd = document.getElementById('{plot_id}');
+function loadFrames() {
+    var frames = JSON.parse(document.getElementById('{plot_id}-frames').textContent);
+    var start = 0;
+    (function next() {
+        Plotly.addFrames(gd, frames.slice(start, start + %d)).then(function() {
+            start += %d;
+            if (start < frames.length) { setTimeout(next, 0); }
+        });
+    })();
+}
+if (document.readyState === 'loading') {
+    document.addEventListener('DOMContentLoaded', loadFrames);
+} else {
+    loadFrames();
+}
+""" % (FRAME_BATCH, FRAME_BATCH)
+
+_TYPED_DTYPES = {'int8': 'i1', 'uint8': 'u1', 'int16': 'i2', 'uint16': 'u2',
+                 'int32': 'i4', 'uint32': 'u4', 'float32': 'f4', 'float64': 'f8'}
+
+
+def _json_engine():
+    try:
+        import orjson  # noqa: F401
+    except ImportError:
+        return 'json'
+    return 'orjson'
+
+
+# Typed arrays
+# =============
+
+def _typed_array(values):
+    """plotly.js typed array spec of a numeric list or array, or None when it isn't one or wouldn't be smaller"""
+    array = np.asarray(values)
+    if array.dtype.kind not in 'iuf' or array.ndim != 1:
+        return None
+    if array.dtype.kind in 'iu':
+        # plotly.js has no 64-bit integer arrays; use the narrowest type that fits
+        for dtype in (np.int8, np.uint8, np.int16, np.uint16, np.int32, np.uint32):
+            info = np.iinfo(dtype)
+            if info.min <= array.min() and array.max() <= info.max:
+                array = array.astype(dtype)
+                break
+        else:
+            array = array.astype(np.float64)
+    elif str(array.dtype) not in _TYPED_DTYPES:
+        # float16, longdouble, ... have no plotly.js typed array
+        array = array.astype(np.float64)
+    if not isinstance(values, np.ndarray):
+        # Short numbers (0.5, 1.25, small integers) are smaller as JSON text than as 8 base64 bytes
+        step = max(1, len(values) // 256)
+        sample = values[::step]
+        text_length = sum(len(repr(v)) + 1 for v in sample) * len(values) / len(sample)
+        if 4 * -(-array.nbytes // 3) >= text_length:
+            return None
+    return {'dtype': _TYPED_DTYPES[str(array.dtype)],
+            'bdata': base64.b64encode(np.ascontiguousarray(array)).decode('ascii')}
+
+
+def _encode_arrays(obj, min_length):
+    """Copy of a trace dict with its long numeric arrays as typed arrays (obj is not modified)"""
+    encoded = {}
+    for key, value in obj.items():
+        if key not in _SKIPPED_KEYS:
+            if isinstance(value, dict):
+                value = _encode_arrays(value, min_length)
+            elif isinstance(value, (list, tuple, np.ndarray)) and len(value) >= min_length:
+                value = _typed_array(value) or value
+        encoded[key] = value
+    return encoded
+
+
+def figure_dict(fig, min_length=MIN_TYPED_LENGTH):
+    """The figure as a dict, with its numeric trace arrays as base64 typed arrays"""
+    if isinstance(fig, BaseFigure):
+        fig_dict = fig.to_plotly_json()
+    else:
+        fig_dict = dict(fig)
+    encoded = {**fig_dict, 'data': [_encode_arrays(trace, min_length) for trace in fig_dict.get('data', [])]}
+    if fig_dict.get('frames'):
+        encoded['frames'] = [{**frame, 'data': [_encode_arrays(trace, min_length) for trace in frame.get('data', [])]}
+                             for frame in fig_dict['frames']]
+    return encoded
+
+
+def figure_json(fig, min_length=MIN_TYPED_LENGTH):
+    """Compact JSON of a figure (orjson when available)"""
+    return pio.json.to_json_plotly(figure_dict(fig, min_length), engine=_json_engine())
+
+
+# HTML export
+# ============
+
+def write_plotlyjs(directory):
+    """Write the bundled plotly.js into directory once; returns its file name"""
+    name = f'plotly-{get_plotlyjs_version()}.min.js'
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(get_plotlyjs())
+        os.replace(tmp, path)
+    return name
+
+
+def write_html(fig, path, plotlyjs=None, lazy_frames=True, **html_kwargs):
+    """
+    Write one figure as HTML that loads plotly.js from a file next to it.
+
+    plotlyjs: file name of the shared plotly.js (written next to path when omitted)
+    lazy_frames: keep animation frames out of the plot call; the page draws
+                 the figure first and adds the frames afterwards, in batches
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    if plotlyjs is None:
+        plotlyjs = write_plotlyjs(directory)
+    fig_dict = figure_dict(fig)
+    frames = fig_dict.pop('frames', None) if lazy_frames else None
+    if frames:
+        html_kwargs.setdefault('div_id', f'plot-{uuid.uuid4().hex}')
+        html_kwargs['post_script'] = [LAZY_FRAMES_SCRIPT] + list(html_kwargs.get('post_script') or [])
+    previous = pio.json.config.default_engine
+    pio.json.config.default_engine = _json_engine()
+    try:
+        html = pio.to_html(fig_dict, include_plotlyjs=plotlyjs, full_html=True, validate=False, **html_kwargs)
+        if frames:
+            # JSON.parse of a data block is much faster than parsing the same frames as script code
+            data = pio.json.to_json_plotly(frames).replace('</', '<\\/')
+            block = f'<script type="application/json" id="{html_kwargs["div_id"]}-frames">{data}</script>\n'
+            html = html.replace('</body>', block + '</body>', 1)
+    finally:
+        pio.json.config.default_engine = previous
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(html)
+    return path
+
+
+def export_figures(figures, directory, **html_kwargs):
+    """
+    Write a dict of {name: figure} as directory/<name>.html, all sharing one
+    plotly.js file. Returns the paths written.
+    """
+    plotlyjs = write_plotlyjs(directory)
+    return [write_html(fig, os.path.join(directory, f'{name}.html'), plotlyjs, **html_kwargs)
+            for name, fig in figures.items()]
+
+
+def show(fig, name):
+    """fig.show(), or write name.html into $FIGURE_EXPORT when that is set"""
+    directory = os.environ.get('FIGURE_EXPORT')
+    if not directory:
+        fig.show()
+        return None
+    path = export_figures({name: fig}, directory)[0]
+    print(f"Figure written to {path}")
+    return path
+
+
+def compare_export(figures, directory):
+    """
+    Size and write time of fig.write_html() (plotly.js embedded in every
+    file) against export_figures(), for a dict of {name: figure}.
+    """
+    standalone = os.path.join(directory, 'standalone')
+    os.makedirs(standalone, exist_ok=True)
+    start = time.perf_counter()
+    for name, fig in figures.items():
+        fig.write_html(os.path.join(standalone, f'{name}.html'))
+    standalone_s = time.perf_counter() - start
+    shared = os.path.join(directory, 'shared')
+    start = time.perf_counter()
+    export_figures(figures, shared)
+    shared_s = time.perf_counter() - start
+
+    def total_bytes(folder):
+        return sum(entry.stat().st_size for entry in os.scandir(folder))
+
+    return {'figures': len(figures), 'json_engine': _json_engine(), 'plotly': plotly.__version__,
+            'standalone_bytes': total_bytes(standalone), 'standalone_s': round(standalone_s, 4),
+            'shared_bytes': total_bytes(shared), 'shared_s': round(shared_s, 4)}
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Group a frame once and slice it many times.
+
+10_allTogether.py selects the same groups over and over, e.g.
+trend_df[trend_df['Income Group'] == 'High Income']['Year'], and each of
+those boolean filters scans the whole frame again. GroupIndex factorizes
+the group column once, puts the rows of each group next to each other with
+one stable argsort, and then serves every group as a slice:
+
+    trend_groups = GroupIndex(trend_df, by='Income Group', key='Year')
+    years = trend_groups.get('High Income', 'Year')         # a view, no copy
+    score_2000 = trend_groups.at('High Income', 2000, 'Score')
+
+Rows keep their original order inside each group, so the slices hold the
+same values (and index labels) as the boolean-filter version.
+
+split() is the same idea for building one trace per category:
+
+    for income, subset in split(outcomes_df, 'Income Level', order=income_levels):
+        fig.add_trace(go.Scatter(x=subset['Resources Index'], y=subset['Math Score'], name=income))
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class GroupIndex:
+    """
+    Row positions of every group of a frame, built once.
+
+    Parameters:
+        df: the frame
+        by: column holding the group labels
+        key: optional column for at() lookups within a group (e.g. 'Year')
+    """
+
+    def __init__(self, df, by, key=None):
+        self.df = df
+        self.by = by
+        self.key = key
+        codes, uniques = pd.factorize(df[by], use_na_sentinel=True)
+        self.groups = list(uniques)
+        self._code_of = {group: i for i, group in enumerate(self.groups)}
+        # One stable sort puts each group's rows together in their original order;
+        # on int8/int16 codes NumPy's stable sort is a radix sort, linear in the rows
+        if len(self.groups) < 2**7:
+            codes = codes.astype(np.int8)
+        elif len(self.groups) < 2**15:
+            codes = codes.astype(np.int16)
+        order = np.argsort(codes, kind='stable')
+        n_missing = int((codes < 0).sum())
+        self.order = order[n_missing:]
+        counts = np.bincount(codes[codes >= 0], minlength=len(self.groups))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+        # Already grouped frames are sliced directly, without reordering anything
+        self._contiguous = n_missing == 0 and bool(np.all(self.order == np.arange(len(self.order))))
+        self._columns = {}
+        self._index = None
+        self._key_positions = {}
+
+    def __len__(self):
+        return len(self.groups)
+
+    def __iter__(self):
+        return iter(self.groups)
+
+    def __contains__(self, group):
+        return group in self._code_of
+
+    def _bounds(self, group):
+        try:
+            code = self._code_of[group]
+        except KeyError:
+            raise KeyError(f"No group {group!r} in column '{self.by}'") from None
+        return self.offsets[code], self.offsets[code + 1]
+
+    def size(self, group):
+        start, stop = self._bounds(group)
+        return int(stop - start)
+
+    def _grouped(self, column):
+        """Column values in grouped order (reordered once per column, then reused)"""
+        if column not in self._columns:
+            values = self.df[column].to_numpy()
+            self._columns[column] = values if self._contiguous else values[self.order]
+        return self._columns[column]
+
+    def _grouped_index(self):
+        if self._index is None:
+            self._index = self.df.index if self._contiguous else self.df.index[self.order]
+        return self._index
+
+    def get(self, group, column):
+        """One column of one group as a Series (a view of the grouped values)"""
+        start, stop = self._bounds(group)
+        return pd.Series(self._grouped(column)[start:stop], index=self._grouped_index()[start:stop],
+                         name=column, copy=False)
+
+    def values(self, group, column):
+        """Like get(), as a NumPy array"""
+        start, stop = self._bounds(group)
+        return self._grouped(column)[start:stop]
+
+    def frame(self, group, columns=None):
+        columns = list(self.df.columns) if columns is None else columns
+        start, stop = self._bounds(group)
+        return pd.DataFrame({c: self._grouped(c)[start:stop] for c in columns},
+                            index=self._grouped_index()[start:stop], copy=False)
+
+    def at(self, group, key, column):
+        """Value of column in the row of group whose key column equals key"""
+        if self.key is None:
+            raise ValueError("GroupIndex was built without a key column")
+        if group not in self._key_positions:
+            keys = self.values(group, self.key)
+            # Sorted keys (like years) are searched in place, others through an argsort
+            self._key_positions[group] = None if np.all(keys[:-1] <= keys[1:]) else np.argsort(keys, kind='stable')
+        keys = self.values(group, self.key)
+        positions = self._key_positions[group]
+        sorted_keys = keys if positions is None else keys[positions]
+        i = int(np.searchsorted(sorted_keys, key))
+        if i == len(sorted_keys) or sorted_keys[i] != key:
+            raise KeyError(f"No row with {self.key} == {key!r} in group {group!r}")
+        return self.values(group, column)[i if positions is None else positions[i]]
+
+
+def split(df, by, columns=None, order=None):
+    """
+    Yield (group, sub-frame) for each group of df[by], like
+    df[df[by] == group] per group but with a single pass over the rows.
+
+    columns: only these columns in the sub-frames
+    order: groups in this order (groups without rows give empty frames);
+           by default every group in order of first appearance
+    """
+    index = GroupIndex(df, by)
+    columns = list(df.columns) if columns is None else list(columns)
+    for group in (index.groups if order is None else order):
+        if group in index:
+            yield group, index.frame(group, columns)
+        else:
+            yield group, df.iloc[:0][columns]
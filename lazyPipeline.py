@@ -0,0 +1,416 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Lazy load -> clean -> visualize pipelines.
+
+The notebook scripts run eagerly: every step copies the whole frame and
+runs even when its result is never looked at. Here each load, cleaning step
+and aggregation is only recorded. Nothing runs until a result (or a figure)
+is asked for, and then the recorded steps are optimized first:
+
+    - dead steps are dropped: a column that no requested result reads is
+      never computed, and sources only load the columns still needed
+    - filters are pushed down past row-by-row steps that don't touch the
+      filtered columns (and into Parquet reads), so fewer rows are processed
+    - runs of column steps are fused: the frame is rebuilt once per run
+      instead of once per step
+    - results requested together share the steps they have in common
+
+    clean = (LazyFrame.from_frame(df)
+             .fillna('price', 'median')
+             .map_str('category', 'title')
+             .clip_iqr('price'))
+    counts = clean.value_counts('category')   # nothing has run yet
+    print(counts.explain())                   # price steps are dropped
+    print(counts.compute())
+
+Conditions are (column, op, value) tuples with op one of <, <=, >, >=, ==,
+!= (as in cleaningTools.COMPARE_OPS), 'in' or 'not in'.
+"""
+
+import pandas as pd
+
+from cleaningTools import COMPARE_OPS
+
+STATISTICS = ['median', 'mean']
+
+STRING_METHODS = ['title', 'lower', 'upper', 'strip']
+
+
+def evaluate_condition(condition, get):
+    """Boolean mask for one (column, op, value) condition; get(column) returns a Series"""
+    column, op, value = condition
+    series = get(column)
+    if op == 'in':
+        return series.isin(value)
+    if op == 'not in':
+        return ~series.isin(value) & series.notna()
+    if op not in COMPARE_OPS:
+        raise ValueError(f"Unknown operator '{op}'. Expected one of {list(COMPARE_OPS) + ['in', 'not in']}")
+    return COMPARE_OPS[op](series, value)
+
+
+def _statistic(series, value):
+    """Resolve 'median'/'mean' against the column, pass anything else through"""
+    if isinstance(value, str) and value in STATISTICS:
+        return getattr(series, value)()
+    return value
+
+
+# Steps
+# ======
+
+class ColumnStep:
+    """
+    Compute one column from other columns.
+
+    row_local steps give each row a value that depends on that row only, so
+    they give the same answer whether rows are filtered before or after.
+    Steps using column statistics (median fill, IQR clipping) are not.
+    """
+
+    def __init__(self, label, target, reads, func, row_local):
+        self.label = label
+        self.target = target
+        self.reads = tuple(reads)
+        self.func = func
+        self.row_local = row_local
+
+    def compute(self, get):
+        return self.func(*[get(c) for c in self.reads])
+
+    def __repr__(self):
+        return self.label
+
+
+class FilterStep:
+    """Keep the rows meeting every condition"""
+
+    row_local = True
+    target = None
+
+    def __init__(self, conditions):
+        self.conditions = list(conditions)
+        self.reads = tuple(dict.fromkeys(c[0] for c in self.conditions))
+
+    def __repr__(self):
+        return 'filter ' + ' & '.join(f'{c} {op} {v!r}' for c, op, v in self.conditions)
+
+
+class SelectStep:
+    """Keep only the given columns"""
+
+    row_local = True
+    target = None
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.reads = tuple(self.columns)
+
+    def __repr__(self):
+        return f'select {self.columns}'
+
+
+class Source:
+    """
+    Where the data comes from.
+
+    loader(columns, filters) returns a DataFrame; columns is None for all
+    columns. Sources that accept filters get the leading filters pushed
+    into them.
+    """
+
+    def __init__(self, label, loader, accepts_filters=False):
+        self.label = label
+        self.loader = loader
+        self.accepts_filters = accepts_filters
+
+    def __repr__(self):
+        return self.label
+
+
+class _Node:
+    __slots__ = ('step', 'parent', 'source')
+
+    def __init__(self, step=None, parent=None, source=None):
+        self.step = step
+        self.parent = parent
+        self.source = source if source is not None else parent.source
+
+    def chain(self):
+        steps = []
+        node = self
+        while node.step is not None:
+            steps.append(node.step)
+            node = node.parent
+        return steps[::-1]
+
+
+# Planning
+# =========
+
+def _push_filters_down(steps):
+    """Move each filter in front of row-local steps that don't write what it reads"""
+    steps = list(steps)
+    for i in range(len(steps)):
+        if not isinstance(steps[i], FilterStep):
+            continue
+        j = i
+        while j > 0:
+            before = steps[j - 1]
+            if isinstance(before, FilterStep):
+                break
+            if isinstance(before, ColumnStep) and (not before.row_local or before.target in steps[j].reads):
+                break
+            steps[j - 1], steps[j] = steps[j], steps[j - 1]
+            j -= 1
+    return steps
+
+
+def _prune(steps, needed):
+    """
+    Drop steps whose output is never read, walking back from the result.
+
+    Returns (kept steps, columns the source must provide or None for all).
+    """
+    kept = []
+    for step in reversed(steps):
+        if isinstance(step, ColumnStep):
+            if needed is not None:
+                if step.target not in needed:
+                    continue
+                needed = (needed - {step.target}) | set(step.reads)
+        elif isinstance(step, SelectStep):
+            columns = step.columns if needed is None else [c for c in step.columns if c in needed]
+            step = SelectStep(columns) if len(columns) != len(step.columns) else step
+            needed = set(columns)
+        elif needed is not None:
+            needed = needed | set(step.reads)
+        kept.append(step)
+    return kept[::-1], needed
+
+
+def _group(steps):
+    """Fuse consecutive column steps and consecutive filters"""
+    groups = []
+    for step in steps:
+        kind = type(step)
+        if groups and groups[-1][0] is kind and kind is not SelectStep:
+            groups[-1][1].append(step)
+        else:
+            groups.append((kind, [step]))
+    return groups
+
+
+class Plan:
+    """Optimized steps for one result"""
+
+    def __init__(self, node, needed):
+        steps = _push_filters_down(node.chain())
+        steps, columns = _prune(steps, needed)
+        self.source = node.source
+        self.source_filters = []
+        if self.source.accepts_filters:
+            while steps and isinstance(steps[0], FilterStep):
+                self.source_filters += steps.pop(0).conditions
+        self.columns = None if columns is None else sorted(columns)
+        self.groups = _group(steps)
+
+    def __str__(self):
+        lines = [f'scan {self.source!r}'
+                 + (f' columns={self.columns}' if self.columns is not None else '')
+                 + (f' filters={self.source_filters}' if self.source_filters else '')]
+        for kind, steps in self.groups:
+            if kind is ColumnStep:
+                lines.append('fused columns: ' + ', '.join(repr(s) for s in steps))
+            elif kind is FilterStep:
+                lines.append('filter ' + ' & '.join(f'{c} {op} {v!r}'
+                                                    for s in steps for c, op, v in s.conditions))
+            else:
+                lines.extend(repr(s) for s in steps)
+        return '\n'.join(lines)
+
+
+def _run_group(df, kind, steps):
+    if kind is ColumnStep:
+        # One rebuild of the frame for the whole run of column steps
+        columns = {}
+        get = lambda c: columns[c] if c in columns else df[c]
+        for step in steps:
+            columns[step.target] = step.compute(get)
+        return df.assign(**columns)
+    if kind is FilterStep:
+        get = lambda c: df[c]
+        mask = None
+        for step in steps:
+            for condition in step.conditions:
+                hit = evaluate_condition(condition, get)
+                mask = hit if mask is None else mask & hit
+        return df[mask.fillna(False).to_numpy(dtype=bool)]
+    return df[steps[0].columns]
+
+
+def collect_all(*results):
+    """
+    Compute several lazy results together.
+
+    Results that start with the same optimized steps share them, so a
+    cleaning chain feeding three summaries runs once.
+    """
+    results = [r if isinstance(r, LazyResult) else r.collect() for r in results]
+    # Plans stay alive until the end so the step ids used in cache keys stay unique
+    plans = [Plan(r.frame._node, None if r.columns is None else set(r.columns)) for r in results]
+    cache = {}
+    outputs = []
+    for result, plan in zip(results, plans):
+        key = (id(plan.source), tuple(plan.columns or ()), plan.columns is None, repr(plan.source_filters))
+        if key not in cache:
+            cache[key] = plan.source.loader(plan.columns, plan.source_filters or None)
+        df = cache[key]
+        for kind, steps in plan.groups:
+            key = key + (kind.__name__,) + tuple(id(s) for s in steps)
+            if key not in cache:
+                cache[key] = _run_group(df, kind, steps)
+            df = cache[key]
+        outputs.append(df if result.func is None else result.func(df))
+    return outputs
+
+
+# Public API
+# ===========
+
+class LazyResult:
+    """A result that is computed on demand from a LazyFrame"""
+
+    def __init__(self, frame, func=None, columns=None, label='collect'):
+        self.frame = frame
+        self.func = func
+        self.columns = None if columns is None else list(columns)
+        self.label = label
+
+    def compute(self):
+        return collect_all(self)[0]
+
+    def explain(self):
+        """The optimized plan as text"""
+        plan = Plan(self.frame._node, None if self.columns is None else set(self.columns))
+        return f'{plan}\n{self.label}'
+
+
+class LazyFrame:
+    """A recorded chain of steps. Every method returns a new LazyFrame."""
+
+    def __init__(self, node):
+        self._node = node
+
+    # Sources
+
+    @classmethod
+    def from_frame(cls, df, label='frame'):
+        def load(columns, filters):
+            return df if columns is None else df[[c for c in df.columns if c in columns]]
+        return cls(_Node(source=Source(label, load)))
+
+    @classmethod
+    def from_loader(cls, loader, label='loader'):
+        """Any function returning a DataFrame; columns are selected after loading"""
+        def load(columns, filters):
+            df = loader()
+            return df if columns is None else df[[c for c in df.columns if c in columns]]
+        return cls(_Node(source=Source(label, load)))
+
+    @classmethod
+    def scan_csv(cls, path, **read_kwargs):
+        """CSV file; only the needed columns are parsed (usecols)"""
+        def load(columns, filters):
+            return pd.read_csv(path, usecols=columns, **read_kwargs)
+        return cls(_Node(source=Source(f'csv {path}', load)))
+
+    @classmethod
+    def scan_parquet(cls, path, **read_kwargs):
+        """Parquet file; needed columns and leading filters are passed to the reader"""
+        def load(columns, filters):
+            return pd.read_parquet(path, columns=columns, filters=filters, **read_kwargs)
+        return cls(_Node(source=Source(f'parquet {path}', load, accepts_filters=True)))
+
+    # Steps
+
+    def _then(self, step):
+        return LazyFrame(_Node(step, self._node))
+
+    def with_column(self, target, func, reads, row_local=False, label=None):
+        """target = func(*[column for column in reads])"""
+        reads = [reads] if isinstance(reads, str) else reads
+        return self._then(ColumnStep(label or f'{target} = {getattr(func, "__name__", "func")}({", ".join(reads)})',
+                                     target, reads, func, row_local))
+
+    def fillna(self, column, value):
+        """Fill missing values with a constant, 'median' or 'mean'"""
+        return self.with_column(column, lambda s: s.fillna(_statistic(s, value)), [column],
+                                row_local=value not in STATISTICS, label=f'fillna {column} {value!r}')
+
+    def map_str(self, column, method):
+        """Apply a string method ('title', 'lower', 'upper', 'strip')"""
+        if method not in STRING_METHODS:
+            raise ValueError(f"Unknown string method '{method}'. Expected one of {STRING_METHODS}")
+        return self.with_column(column, lambda s: getattr(s.str, method)(), [column],
+                                row_local=True, label=f'{column}.str.{method}()')
+
+    def to_datetime(self, column, target=None, format='mixed'):
+        target = target or column
+        return self.with_column(target, lambda s: pd.to_datetime(s, format=format), [column],
+                                row_local=True, label=f'{target} = to_datetime({column})')
+
+    def replace_where(self, column, condition, value):
+        """Set column to value ('median'/'mean' allowed) where the condition holds"""
+        def replace(series, *others):
+            get = dict(zip(reads, (series,) + others)).__getitem__
+            return series.mask(evaluate_condition(condition, get).fillna(False).astype(bool),
+                               _statistic(series, value))
+        reads = list(dict.fromkeys([column, condition[0]]))
+        return self.with_column(column, replace, reads, row_local=value not in STATISTICS,
+                                label=f'{column} = {value!r} where {condition[0]} {condition[1]} {condition[2]!r}')
+
+    def clip(self, column, lower=None, upper=None):
+        return self.with_column(column, lambda s: s.clip(lower=lower, upper=upper), [column],
+                                row_local=True, label=f'clip {column} [{lower}, {upper}]')
+
+    def clip_iqr(self, column, k=1.5):
+        """Clip to [Q1 - k*IQR, Q3 + k*IQR], as in clean_data()"""
+        def clip(s):
+            q1, q3 = s.quantile(0.25), s.quantile(0.75)
+            return s.clip(lower=q1 - k * (q3 - q1), upper=q3 + k * (q3 - q1))
+        return self.with_column(column, clip, [column], label=f'clip_iqr {column}')
+
+    def filter(self, *conditions):
+        """Keep rows meeting every condition (each one is pushed down on its own)"""
+        frame = self
+        for condition in conditions:
+            frame = frame._then(FilterStep([condition]))
+        return frame
+
+    def select(self, columns):
+        return self._then(SelectStep(columns))
+
+    # Results
+
+    def collect(self):
+        return LazyResult(self)
+
+    def apply(self, func, columns=None, label=None):
+        """func(frame) on demand; columns lists what func reads (None: all)"""
+        return LazyResult(self, func, columns, label or getattr(func, '__name__', 'apply'))
+
+    def plot(self, func, columns=None):
+        """A figure drawn by func(frame) when compute() is called"""
+        return self.apply(func, columns, label=f'plot {getattr(func, "__name__", "")}'.strip())
+
+    def value_counts(self, column):
+        return self.apply(lambda df: df[column].value_counts(), [column], label=f'value_counts {column}')
+
+    def describe(self, columns):
+        return self.apply(lambda df: df[list(columns)].describe(), columns, label=f'describe {list(columns)}')
+
+    def explain(self):
+        return self.collect().explain()
@@ -0,0 +1,447 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Live-updating plotly figures, sent to the browser as small patches.
+
+To show new data, a static figure has to be rebuilt and fig.show() called
+again, which sends and redraws the whole figure. A LiveFigure keeps the
+figure on the Python side and only sends what changed:
+
+    live = LiveFigure(fig, fps=60)
+    print(live.serve())                              # http://127.0.0.1:8050/
+    live.extend_trace('Lowest 20%', x=new_x, y=new_y)     # append points
+    live.update_trace('Trend Line', x=x_line, y=y_line)   # replace arrays
+    live.update_annotation(3, text='120 districts')
+    ...
+    live.close()
+
+Updates are collected and sent at most fps times a second: several
+update_trace() calls on the same array between two frames send only the
+last value, extend_trace() calls are joined into one append, and values
+equal to what the browser already shows are not sent at all. Each patch
+holds only the changed trace arrays (numeric ones as base64 typed arrays)
+and layout properties such as annotation text, and the page applies it
+with one Plotly.update / Plotly.extendTraces call.
+
+serve() needs nothing beyond the standard library: a local HTTP server
+hands out the page, plotly.js and a Server-Sent Events stream of patches.
+In Jupyter, widget() returns a go.FigureWidget that receives the same
+patches (needs anywidget).
+"""
+
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+from plotly.offline import get_plotlyjs
+
+from figureExport import MIN_TYPED_LENGTH, _encode_arrays, figure_json
+
+DEFAULT_FPS = 60
+
+# Sent on an idle stream so proxies and browsers keep the connection open
+KEEPALIVE_S = 15
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>%(title)s</title>
+<script src="/plotly.min.js"></script>
+</head>
+<body style="margin: 0">
+<div id="live" style="width: 100vw; height: 100vh"></div>
+<script>
+var gd = document.getElementById('live');
+var TYPES = {i1: Int8Array, u1: Uint8Array, i2: Int16Array, u2: Uint16Array,
+             i4: Int32Array, u4: Uint32Array, f4: Float32Array, f8: Float64Array};
+
+// Typed array specs become real typed arrays, so extendTraces can append to them
+function decode(value) {
+    if (value && typeof value === 'object' && typeof value.bdata === 'string' && TYPES[value.dtype]) {
+        var text = atob(value.bdata);
+        var bytes = new Uint8Array(text.length);
+        for (var i = 0; i < text.length; i++) { bytes[i] = text.charCodeAt(i); }
+        return new TYPES[value.dtype](bytes.buffer);
+    }
+    if (value && typeof value === 'object' && !Array.isArray(value)) {
+        for (var key in value) { value[key] = decode(value[key]); }
+    }
+    return value;
+}
+
+// Typed arrays are appended only to typed arrays of the same type, anything else as a plain array
+function appendable(trace, path, values) {
+    var keys = path.split('.');
+    for (var i = 0; i < keys.length - 1; i++) { trace = trace[keys[i]] = trace[keys[i]] || {}; }
+    var key = keys[keys.length - 1];
+    var current = trace[key] || [];
+    if (ArrayBuffer.isView(current) && current.constructor === values.constructor) { return values; }
+    trace[key] = ArrayBuffer.isView(current) ? Array.from(current) : current;
+    return ArrayBuffer.isView(values) ? Array.from(values) : values;
+}
+
+// One Plotly.update for all changed traces and layout, one extendTraces per set of appended keys
+function applyPatch(patch) {
+    var indices = Object.keys(patch.traces).map(Number);
+    var update = {};
+    indices.forEach(function(index, n) {
+        var props = patch.traces[index];
+        for (var path in props) {
+            // undefined leaves a trace's value as it is
+            update[path] = update[path] || new Array(indices.length);
+            update[path][n] = props[path];
+        }
+    });
+    var done = Promise.resolve();
+    if (indices.length || Object.keys(patch.layout).length) {
+        done = done.then(function() { return Plotly.update(gd, update, patch.layout, indices); });
+    }
+    var groups = {};
+    Object.keys(patch.extend).forEach(function(index) {
+        var extend = patch.extend[index];
+        var keys = Object.keys(extend.data).sort().join(',') + '|' + extend.max_points;
+        groups[keys] = groups[keys] || {data: {}, indices: [], max_points: extend.max_points};
+        for (var key in extend.data) {
+            var values = appendable(gd.data[index], key, extend.data[key]);
+            (groups[keys].data[key] = groups[keys].data[key] || []).push(values);
+        }
+        groups[keys].indices.push(Number(index));
+    });
+    Object.keys(groups).forEach(function(keys) {
+        var group = groups[keys];
+        done = done.then(function() {
+            return Plotly.extendTraces(gd, group.data, group.indices, group.max_points || undefined);
+        });
+    });
+    return done;
+}
+
+// Patches are applied once per animation frame (none while the tab is hidden)
+var pending = [];
+var drawing = Promise.resolve();
+function draw() {
+    var patches = pending;
+    pending = [];
+    drawing = drawing.then(function() {
+        return patches.reduce(function(done, patch) {
+            return done.then(function() { return applyPatch(patch); });
+        }, Promise.resolve());
+    });
+}
+
+var source = new EventSource('/events');
+source.addEventListener('figure', function(event) {
+    var fig = JSON.parse(event.data);
+    pending = [];
+    drawing = drawing.then(function() {
+        return Plotly.react(gd, fig.data.map(decode), fig.layout, {responsive: true});
+    });
+});
+source.addEventListener('patch', function(event) {
+    if (!pending.length) { requestAnimationFrame(draw); }
+    pending.push(decode(JSON.parse(event.data)));
+});
+</script>
+</body>
+</html>
+"""
+
+
+def _flatten(props, prefix=''):
+    """{'marker': {'size': s}} as {'marker.size': s}, the property paths plotly.js restyles"""
+    flat = {}
+    for key, value in props.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f'{prefix}{key}.'))
+        else:
+            flat[prefix + key] = value.to_numpy() if hasattr(value, 'to_numpy') else value
+    return flat
+
+
+def _same(a, b):
+    if a is None or b is None:
+        return a is b
+    return bool(np.array_equal(np.asarray(a), np.asarray(b)))
+
+
+def _concat(old, new):
+    if old is None or len(old) == 0:
+        return np.asarray(new)
+    return np.concatenate([np.asarray(old), np.asarray(new)])
+
+
+def apply_patch(fig, patch):
+    """Apply a patch (as sent by LiveFigure) to a go.Figure or go.FigureWidget"""
+    for index, props in patch['traces'].items():
+        trace = fig.data[index]
+        for path, value in props.items():
+            trace[path] = value
+    for index, extend in patch['extend'].items():
+        trace = fig.data[index]
+        for key, values in extend['data'].items():
+            combined = _concat(trace[key], values)
+            trace[key] = combined[-extend['max_points']:] if extend['max_points'] else combined
+    for path, value in patch['layout'].items():
+        fig.layout[path] = value
+
+
+class LiveFigure:
+    """
+    A figure whose changes are pushed to its viewers as throttled patches.
+
+    Parameters:
+        fig: the figure to start from (copied)
+        fps: most patches sent per second (the display frame rate)
+        title: page title for serve()
+    """
+
+    def __init__(self, fig, fps=DEFAULT_FPS, title='Live dashboard'):
+        self.fig = go.Figure(fig)
+        self.fps = fps
+        self.title = title
+        self._lock = threading.Lock()
+        self._sinks = []
+        self._closed = threading.Event()
+        self._thread = None
+        self._server = None
+        self._viewers = []
+        self._reset_pending()
+        self.updates = 0
+        self.patches = 0
+        self.bytes_sent = 0
+
+    def _reset_pending(self):
+        self._traces, self._extend, self._layout = {}, {}, {}
+
+    # Updates
+    # ========
+
+    def trace_index(self, trace):
+        """Index of a trace given by index or name"""
+        if isinstance(trace, int):
+            return trace
+        for index, candidate in enumerate(self.fig.data):
+            if candidate.name == trace:
+                return index
+        raise KeyError(f"No trace named {trace!r}")
+
+    def update_trace(self, trace, **props):
+        """Set trace properties (arrays are replaced), e.g. update_trace('Trend Line', x=..., y=...)"""
+        with self._lock:
+            index = self.trace_index(trace)
+            pending = self._traces.get(index, {})
+            appending = self._extend.get(index, {}).get('data', {})
+            for path, value in _flatten(props).items():
+                current = pending[path] if path in pending else self.fig.data[index][path]
+                if path not in appending and _same(current, value):
+                    continue
+                # A new value replaces any points appended to the old one since the last frame
+                if appending.pop(path, None) is not None and not appending:
+                    del self._extend[index]
+                self._traces.setdefault(index, {})[path] = value
+            self.updates += 1
+
+    def extend_trace(self, trace, max_points=None, **columns):
+        """
+        Append points to a trace's arrays, e.g. extend_trace(0, x=[...], y=[...]).
+
+        max_points: keep only the last max_points points (a scrolling window)
+        """
+        with self._lock:
+            index = self.trace_index(trace)
+            pending = self._traces.get(index, {})
+            for key, values in _flatten(columns).items():
+                if key in pending:
+                    # Still unsent: append to the new value itself
+                    combined = _concat(pending[key], values)
+                    pending[key] = combined[-max_points:] if max_points else combined
+                    continue
+                extend = self._extend.setdefault(index, {'data': {}, 'max_points': max_points})
+                extend['data'][key] = _concat(extend['data'].get(key), values)
+                extend['max_points'] = max_points
+            self.updates += 1
+
+    def update_layout(self, **props):
+        """Set layout properties by path, e.g. update_layout(title={'text': ...})"""
+        with self._lock:
+            for path, value in _flatten(props).items():
+                current = self._layout[path] if path in self._layout else self.fig.layout[path]
+                if not _same(current, value):
+                    self._layout[path] = value
+            self.updates += 1
+
+    def annotation_index(self, text):
+        """Index of the first annotation whose text starts with text (look it up before changing the text)"""
+        with self._lock:
+            for index, annotation in enumerate(self.fig.layout.annotations):
+                if (annotation.text or '').startswith(text):
+                    return index
+        raise KeyError(f"No annotation starting with {text!r}")
+
+    def update_annotation(self, annotation, **props):
+        """Set properties (usually text) of an annotation, given by index or by the start of its text"""
+        index = annotation if isinstance(annotation, int) else self.annotation_index(annotation)
+        self.update_layout(**{f'annotations[{index}]': props})
+
+    # Sending
+    # ========
+
+    def flush(self):
+        """Send the pending changes as one patch now; returns the patch (None when nothing changed)"""
+        with self._lock:
+            if not (self._traces or self._extend or self._layout):
+                return None
+            patch = {'traces': self._traces, 'extend': self._extend, 'layout': self._layout}
+            self._reset_pending()
+            apply_patch(self.fig, patch)
+            # Still under the lock: a viewer that joins now gets either the figure before this patch and
+            # the patch, or the figure after it, never both
+            for sink in self._sinks:
+                sink(patch)
+            self.patches += 1
+        return patch
+
+    def _run(self):
+        while not self._closed.wait(1 / self.fps):
+            self.flush()
+
+    def _add_sink(self, sink):
+        with self._lock:
+            self._sinks.append(sink)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='LiveFigure', daemon=True)
+            self._thread.start()
+
+    def encode_patch(self, patch):
+        """JSON text of a patch, with numeric arrays as base64 typed arrays"""
+        encoded = {
+            'traces': {str(index): _encode_arrays(props, MIN_TYPED_LENGTH) for index, props in patch['traces'].items()},
+            'extend': {str(index): {'data': _encode_arrays(extend['data'], MIN_TYPED_LENGTH),
+                               'max_points': extend['max_points']}
+                       for index, extend in patch['extend'].items()},
+            'layout': patch['layout'],
+        }
+        return pio.json.to_json_plotly(encoded)
+
+    def widget(self):
+        """go.FigureWidget that follows this figure (for Jupyter; needs anywidget)"""
+        with self._lock:
+            widget = go.FigureWidget(self.fig)
+
+        def update_widget(patch):
+            with widget.batch_update():
+                apply_patch(widget, patch)
+
+        self._add_sink(update_widget)
+        return widget
+
+    def serve(self, host='127.0.0.1', port=8050):
+        """
+        Serve the live page on http://host:port/ from a background thread
+        (port 0 picks a free port); returns its URL.
+        """
+        handler = type('Handler', (_LiveHandler,), {'live': self})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+
+        def broadcast(patch):
+            message = self.encode_patch(patch)
+            for viewer in self._viewers:
+                viewer.put(message)
+            self.bytes_sent += len(message) * len(self._viewers)
+
+        self._add_sink(broadcast)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def _connect(self):
+        """A new viewer's message queue and the current figure, taken together"""
+        viewer = queue.Queue()
+        with self._lock:
+            self._viewers.append(viewer)
+            return viewer, figure_json(self.fig)
+
+    def _disconnect(self, viewer):
+        with self._lock:
+            self._viewers.remove(viewer)
+
+    def close(self):
+        """Send what is pending, then stop the updates and the server"""
+        self.flush()
+        self._closed.set()
+        if self._server is not None:
+            with self._lock:
+                for viewer in self._viewers:
+                    viewer.put(None)
+            self._server.shutdown()
+            self._server.server_close()
+
+    def stats(self):
+        """Updates received against patches sent (the difference is what throttling saved)"""
+        return {'updates': self.updates, 'patches': self.patches, 'bytes_sent': self.bytes_sent,
+                'fps': self.fps}
+
+
+class _LiveHandler(BaseHTTPRequestHandler):
+    """The page, plotly.js and the patch stream of one LiveFigure"""
+
+    live = None
+    _plotlyjs = None
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/':
+            self._send(200, 'text/html; charset=utf-8', (PAGE % {'title': self.live.title}).encode('utf-8'))
+        elif path == '/plotly.min.js':
+            if _LiveHandler._plotlyjs is None:
+                _LiveHandler._plotlyjs = get_plotlyjs().encode('utf-8')
+            self._send(200, 'application/javascript', _LiveHandler._plotlyjs)
+        elif path == '/events':
+            self._stream()
+        else:
+            self._send(404, 'text/plain', b'Not found')
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _event(self, name, data):
+        self.wfile.write(f'event: {name}\ndata: {data}\n\n'.encode('utf-8'))
+        self.wfile.flush()
+
+    def _stream(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        viewer, fig_json = self.live._connect()
+        try:
+            self._event('figure', fig_json)
+            while True:
+                try:
+                    message = viewer.get(timeout=KEEPALIVE_S)
+                except queue.Empty:
+                    self.wfile.write(b': keepalive\n\n')
+                    self.wfile.flush()
+                    continue
+                if message is None:
+                    break
+                self._event('patch', message)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.live._disconnect(viewer)
+
+    def log_message(self, format, *args):
+        pass
+
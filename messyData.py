@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Synthetic messy data at any size.
+
+7. DataClean.py and 9. MissingData.py build small toy frames and corrupt
+them by hand. This module produces the same kinds of problems for any
+number of rows, chunk by chunk, so the cleaning and loading code can be
+tried on realistic volumes:
+
+    - missing blocks (None/NaN/empty string runs)
+    - mixed date formats
+    - category misspellings and case variations
+    - sentinel strings in a numeric column
+    - negative quantities, zero prices and unknown store IDs
+    - extreme outliers
+
+Output is reproducible: the same seed and chunk size always give the same
+rows. Example:
+
+    python messyData.py 1000000 messy_sales.csv
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+CATEGORIES = ['Electronics', 'Clothing', 'Food', 'Books']
+STORES = ['S01', 'S02', 'S03', 'S04']
+
+# Same variations as the Inconsistent Formats section of 7. DataClean.py
+CATEGORY_VARIATIONS = {
+    'Electronics': ['electronic', 'Electronics', 'ELECTRONICS', 'electroNics', 'electron.'],
+    'Clothing': ['clothing', 'CLOTHING', 'Cloths', 'clothes', 'apparels'],
+    'Food': ['food', 'FOOD', 'Foods', 'F00d', 'food items'],
+    'Books': ['books', 'BOOKS', 'Book', 'BOOKs', 'bks']
+}
+
+DATE_FORMATS = ['%Y-%m-%d', '%m/%d/%Y', '%d-%b-%Y', '%B %d, %Y']
+
+SENTINELS = ['out_of_stock', 'back_ordered']
+
+# Share of rows affected by each kind of corruption
+DEFAULT_RATES = {
+    'missing_blocks': 0.05,     # rows inside a missing block, per column
+    'mixed_dates': 0.30,        # dates not in ISO format
+    'misspellings': 0.10,       # category variations
+    'sentinels': 0.08,          # sentinel strings in mixed_quantity
+    'negative_quantity': 0.01,
+    'zero_price': 0.01,
+    'unknown_store': 0.01,
+    'outliers': 0.005,
+}
+
+# Length of each missing block, in rows
+MISSING_BLOCK_LENGTH = 20
+
+# Dates repeat every ten years of rows
+DATE_CYCLE_DAYS = 3650
+
+FORMATS = ['csv', 'xlsx', 'json', 'parquet']
+
+# Excel's row limit per sheet (including the header row)
+EXCEL_MAX_ROWS = 1_048_576
+
+
+# Generating chunks
+# ==================
+
+def _missing_block_mask(rng, n_rows, rate):
+    """Mask made of runs of MISSING_BLOCK_LENGTH rows covering about rate of rows"""
+    n_blocks = rng.binomial(max(n_rows // MISSING_BLOCK_LENGTH, 0), rate)
+    mask = np.zeros(n_rows, dtype=bool)
+    if n_blocks == 0 or n_rows == 0:
+        return mask
+    starts = rng.integers(0, n_rows, n_blocks)
+    offsets = np.arange(MISSING_BLOCK_LENGTH)
+    rows = (starts[:, None] + offsets).ravel()
+    mask[rows[rows < n_rows]] = True
+    return mask
+
+
+def generate_chunk(start, n_rows, seed=42, rates=None, start_date='2023-01-01'):
+    """
+    Generate rows start..start + n_rows of the messy sales dataset.
+
+    The random generator is seeded from (seed, start), so a chunk only
+    depends on its position and the seed.
+    """
+    rates = {**DEFAULT_RATES, **(rates or {})}
+    rng = np.random.default_rng([seed, start])
+    row_ids = np.arange(start, start + n_rows)
+
+    # 1. Clean base data (same shape as the sample in 7. DataClean.py)
+    day_of_cycle = row_ids % DATE_CYCLE_DAYS
+    calendar = pd.date_range(start_date, periods=DATE_CYCLE_DAYS, freq='D')
+    dates = calendar[day_of_cycle]
+    category_codes = rng.integers(0, len(CATEGORIES), n_rows)
+    df = pd.DataFrame({
+        'date': dates,
+        'productid': 'PROD' + pd.Series(row_ids % 100_000).astype(str).str.zfill(5).to_numpy(),
+        'quantity': rng.integers(1, 100, n_rows).astype('float64'),
+        'price': rng.uniform(10, 1000, n_rows).round(2),
+        'category': np.asarray(CATEGORIES, dtype=object)[category_codes],
+        'store_id': np.asarray(STORES, dtype=object)[rng.integers(0, len(STORES), n_rows)],
+    })
+
+    # 2. Mixed date formats (format each calendar day once, then look up)
+    formatted = np.array([calendar.strftime(f).to_numpy(dtype=object) for f in DATE_FORMATS])
+    format_choice = np.where(rng.random(n_rows) < rates['mixed_dates'],
+                             rng.integers(1, len(DATE_FORMATS), n_rows), 0)
+    df['date_string'] = formatted[format_choice, day_of_cycle]
+
+    # 3. Category misspellings and case variations
+    variations = np.array([CATEGORY_VARIATIONS[c] for c in CATEGORIES], dtype=object)
+    misspelled = np.flatnonzero(rng.random(n_rows) < rates['misspellings'])
+    pick = rng.integers(0, variations.shape[1], len(misspelled))
+    category = df['category'].to_numpy(dtype=object)
+    category[misspelled] = variations[category_codes[misspelled], pick]
+    df['category'] = category
+
+    # 4. Sentinel strings in a numbers-as-strings column
+    mixed_quantity = df['quantity'].astype('int64').astype(str).to_numpy(dtype=object)
+    sentinel_rows = rng.random(n_rows) < rates['sentinels']
+    mixed_quantity[sentinel_rows] = np.asarray(SENTINELS, dtype=object)[
+        rng.integers(0, len(SENTINELS), sentinel_rows.sum())]
+    df['mixed_quantity'] = mixed_quantity
+
+    # 5. Incorrect values
+    df.loc[rng.random(n_rows) < rates['negative_quantity'], 'quantity'] = -100
+    df.loc[rng.random(n_rows) < rates['zero_price'], 'price'] = 0
+    df.loc[rng.random(n_rows) < rates['unknown_store'], 'store_id'] = 'UNKNOWN'
+
+    # 6. Extreme outliers
+    outliers = rng.random(n_rows) < rates['outliers']
+    # One draw per row picks its corruption, so every outlier row gets exactly one
+    corrupt_price = rng.random(n_rows) < 0.5
+    df.loc[outliers & corrupt_price, 'price'] = 999999.99
+    df.loc[outliers & ~corrupt_price, 'quantity'] = 99999
+
+    # 7. Missing blocks (None, NaN and empty strings like in 7. DataClean.py)
+    df.loc[_missing_block_mask(rng, n_rows, rates['missing_blocks']), 'quantity'] = np.nan
+    df.loc[_missing_block_mask(rng, n_rows, rates['missing_blocks']), 'price'] = np.nan
+    df.loc[_missing_block_mask(rng, n_rows, rates['missing_blocks']), 'category'] = ''
+    df.loc[_missing_block_mask(rng, n_rows, rates['missing_blocks']), 'date_string'] = None
+
+    df.index = row_ids
+    return df
+
+
+def iter_messy_chunks(n_rows, chunk_size=100_000, seed=42, rates=None):
+    """Yield the messy dataset as DataFrames of at most chunk_size rows"""
+    for start in range(0, n_rows, chunk_size):
+        yield generate_chunk(start, min(chunk_size, n_rows - start), seed=seed, rates=rates)
+
+
+def make_messy_data(n_rows, seed=42, rates=None):
+    """The whole messy dataset as one DataFrame (for small sizes)"""
+    chunks = list(iter_messy_chunks(n_rows, seed=seed, rates=rates))
+    return pd.concat(chunks) if chunks else generate_chunk(0, 0, seed=seed, rates=rates)
+
+
+# Writing files
+# ==============
+
+def _write_csv(path, chunks):
+    for i, chunk in enumerate(chunks):
+        chunk.to_csv(path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+
+
+def _write_json(path, chunks):
+    # JSON Lines: one record per line, so chunks can simply be appended
+    with open(path, 'w', encoding='utf-8') as f:
+        for chunk in chunks:
+            records = chunk.to_json(orient='records', lines=True, date_format='iso')
+            f.write(records if records.endswith('\n') else records + '\n')
+
+
+def _write_parquet(path, chunks):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("pyarrow is required for Parquet output. Install with: pip install pyarrow")
+
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _write_xlsx(path, chunks):
+    from openpyxl import Workbook
+
+    # Write-only mode streams rows to disk instead of keeping every cell in memory
+    wb = Workbook(write_only=True)
+    sheet = None
+    rows_in_sheet = 0
+    for chunk in chunks:
+        values = chunk.astype(object).where(chunk.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            if sheet is None or rows_in_sheet >= EXCEL_MAX_ROWS:
+                sheet = wb.create_sheet(f'Sales_{len(wb.worksheets) + 1}')
+                sheet.append(list(chunk.columns))
+                rows_in_sheet = 1
+            sheet.append(row)
+            rows_in_sheet += 1
+    wb.save(path)
+
+
+WRITERS = {
+    'csv': _write_csv,
+    'json': _write_json,
+    'parquet': _write_parquet,
+    'xlsx': _write_xlsx,
+}
+
+
+def write_messy_data(path, n_rows, fmt=None, chunk_size=100_000, seed=42, rates=None):
+    """
+    Stream the messy dataset to a file, one chunk at a time.
+
+    Parameters:
+        path: output file
+        n_rows: number of rows to write
+        fmt: 'csv', 'xlsx', 'json' (JSON Lines) or 'parquet';
+             taken from the file extension when None
+        chunk_size: rows generated and written per step
+        seed: random seed
+
+    Returns:
+        path
+    """
+    fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown format '{fmt}'. Expected one of {FORMATS}")
+    WRITERS[fmt](path, iter_messy_chunks(n_rows, chunk_size=chunk_size, seed=seed, rates=rates))
+    return path
+
+
+if __name__ == '__main__':
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    path = sys.argv[2] if len(sys.argv) > 2 else 'messy_sales.csv'
+    write_messy_data(path, n_rows)
+    print(f"Wrote {n_rows:,} rows to {path}")
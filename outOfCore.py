@@ -0,0 +1,462 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Partitioned, disk-backed frames for the cleaning and missing-data steps.
+
+clean_data() in 7. DataClean.py and the 9. MissingData.py workflows need
+the whole dataset in memory as one frame. A PartitionedFrame keeps the rows
+on disk as a sequence of partitions (pickled frames, so dtypes round-trip
+exactly) and only loads a few at a time. Operations run on the partitions
+in parallel worker processes and write a new PartitionedFrame.
+
+Operations that look across partition boundaries are handled in two passes
+so the results are identical to running pandas on the whole frame:
+
+    - median / quantile: exact radix selection over all partitions
+      (a few histogram passes, then only the values in one bucket are
+      gathered), interpolated the same way numpy does
+    - ffill / bfill: each partition reports its last (first) valid value,
+      and the value carried in from earlier (later) partitions fills the
+      partition's leading (trailing) gap
+    - interpolate: each partition gets the nearest valid point on each side,
+      with its global row position
+
+    pf = PartitionedFrame.from_chunks(iter_messy_chunks(10_000_000), 'work')
+    pf = pf.fillna('price', 'median').str_method('category', 'title')
+    pf = pf.ffill('quantity')
+    df = pf.to_pandas()   # only when the result fits in memory
+"""
+
+import math
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from cleaningTools import validate_rules
+from lazyPipeline import evaluate_condition
+
+DEFAULT_PARTITION_ROWS = 1_000_000
+
+# Radix selection: digits per pass, and bucket size small enough to gather
+RADIX_BITS = 16
+GATHER_LIMIT = 1_000_000
+
+_SIGN_BIT = np.uint64(1 << 63)
+
+
+# Partition tasks
+# ================
+# Top-level functions so worker processes can unpickle them.
+
+def _load(path):
+    return pd.read_pickle(path)
+
+
+def _apply_task(task):
+    source, target, func, args = task
+    df = func(_load(source), *args)
+    df.to_pickle(target)
+    return len(df)
+
+
+def _reduce_task(task):
+    source, func, args = task
+    return func(_load(source), *args)
+
+
+def _fillna(df, column, value):
+    return df.assign(**{column: df[column].fillna(value)})
+
+
+def _str_method(df, column, method):
+    return df.assign(**{column: getattr(df[column].str, method)()})
+
+
+def _to_datetime(df, column, target, format):
+    return df.assign(**{target: pd.to_datetime(df[column], format=format)})
+
+
+def _replace_where(df, column, condition, value):
+    hit = evaluate_condition(condition, df.__getitem__).fillna(False).astype(bool)
+    return df.assign(**{column: df[column].mask(hit, value)})
+
+
+def _clip(df, column, lower, upper):
+    return df.assign(**{column: df[column].clip(lower=lower, upper=upper)})
+
+
+def _ffill(df, column, carry):
+    filled = df[column].ffill()
+    # Only the partition's leading gap is still missing after ffill
+    if carry is not None:
+        filled = filled.fillna(carry)
+    return df.assign(**{column: filled})
+
+
+def _bfill(df, column, carry):
+    filled = df[column].bfill()
+    if carry is not None:
+        filled = filled.fillna(carry)
+    return df.assign(**{column: filled})
+
+
+def _interpolate(df, column, offset, before, after):
+    values = df[column].to_numpy(dtype='float64', copy=True)
+    missing = np.isnan(values)
+    if not missing.any():
+        return df
+    positions = offset + np.arange(len(values))
+    known_x = positions[~missing]
+    known_y = values[~missing]
+    # The nearest valid points in other partitions, at their global positions
+    if before is not None:
+        known_x = np.concatenate([[before[0]], known_x])
+        known_y = np.concatenate([[before[1]], known_y])
+    if after is not None:
+        known_x = np.concatenate([known_x, [after[0]]])
+        known_y = np.concatenate([known_y, [after[1]]])
+    if len(known_x) == 0:
+        return df
+    # Like pandas' forward interpolation: gaps before the first valid value stay missing
+    fill = missing & (positions > known_x[0])
+    values[fill] = np.interp(positions[fill], known_x, known_y)
+    return df.assign(**{column: values.astype(df[column].dtype, copy=False)})
+
+
+def _edges(df, column):
+    """(first valid value, its position, last valid value, its position) within the partition"""
+    series = df[column]
+    valid = np.flatnonzero(series.notna().to_numpy())
+    if len(valid) == 0:
+        return None
+    return (series.iloc[valid[0]], int(valid[0]), series.iloc[valid[-1]], int(valid[-1]))
+
+
+def _null_counts(df):
+    return df.isnull().sum()
+
+
+def _violation_counts(df, rules):
+    return validate_rules(df, rules).counts
+
+
+def _value_counts(df, column):
+    return df[column].value_counts(dropna=False)
+
+
+# Exact quantiles by radix selection
+# ===================================
+
+def _order_keys(values):
+    """uint64 keys that sort in the same order as the (non-missing) values"""
+    if values.dtype.kind == 'f':
+        bits = values.astype('float64').view('uint64')
+        return np.where(bits & _SIGN_BIT, ~bits, bits | _SIGN_BIT)
+    if values.dtype.kind in 'iub':
+        return values.astype('int64').view('uint64') ^ _SIGN_BIT
+    raise TypeError(f"Quantiles need a numeric column, got dtype {values.dtype}")
+
+
+def _valid_values(df, column):
+    values = df[column].to_numpy()
+    if values.dtype.kind == 'f':
+        values = values[~np.isnan(values)]
+    return values
+
+
+def _in_bucket(keys, prefix, known_bits):
+    if known_bits == 0:
+        return np.ones(len(keys), dtype=bool)
+    return (keys >> np.uint64(64 - known_bits)) == np.uint64(prefix)
+
+
+def _count_valid(df, column):
+    return len(_valid_values(df, column))
+
+
+def _sum_valid(df, column):
+    return _valid_values(df, column).sum(dtype='float64')
+
+
+def _radix_histogram(df, column, prefix, known_bits):
+    """Next-digit histogram of the bucket, with its (smallest key, largest key, smallest value)"""
+    values = _valid_values(df, column)
+    keys = _order_keys(values)
+    inside = _in_bucket(keys, prefix, known_bits)
+    values, keys = values[inside], keys[inside]
+    key_range = (keys.min(), keys.max(), values[keys.argmin()]) if len(keys) else None
+    if known_bits == 64:
+        # A full key is a single value: there is no next digit
+        return np.zeros(1 << RADIX_BITS, dtype='int64'), key_range
+    digits = (keys >> np.uint64(64 - known_bits - RADIX_BITS)) & np.uint64((1 << RADIX_BITS) - 1)
+    return np.bincount(digits.astype('int64'), minlength=1 << RADIX_BITS), key_range
+
+
+def _bucket_values(df, column, prefix, known_bits):
+    values = _valid_values(df, column)
+    return values[_in_bucket(_order_keys(values), prefix, known_bits)]
+
+
+def _min_above_bucket(df, column, prefix, known_bits):
+    values = _valid_values(df, column)
+    keys = _order_keys(values)
+    above = (keys >> np.uint64(64 - known_bits)) > np.uint64(prefix)
+    return values[above].min() if above.any() else None
+
+
+def _lerp(a, b, t):
+    """numpy's linear interpolation between neighbouring order statistics"""
+    diff = b - a
+    return b - diff * (1 - t) if t >= 0.5 else a + diff * t
+
+
+# Partitioned frames
+# ===================
+
+class PartitionedFrame:
+    """
+    A frame stored on disk as partitions of consecutive rows.
+
+    Parameters:
+        paths: pickled partition files, in row order
+        lengths: number of rows in each partition
+        workdir: directory where derived frames create their partitions
+        n_jobs: worker processes (None: one per CPU, 1: run in this process)
+    """
+
+    def __init__(self, paths, lengths, workdir, n_jobs=None):
+        self.paths = list(paths)
+        self.lengths = list(lengths)
+        self.workdir = workdir
+        self.n_jobs = n_jobs
+
+    # Building
+
+    @classmethod
+    def from_chunks(cls, chunks, workdir, n_jobs=None):
+        """Write an iterable of DataFrames as partitions"""
+        os.makedirs(workdir, exist_ok=True)
+        directory = tempfile.mkdtemp(prefix='part_', dir=workdir)
+        paths, lengths = [], []
+        for i, chunk in enumerate(chunks):
+            path = os.path.join(directory, f'{i:06d}.pkl')
+            chunk.to_pickle(path)
+            paths.append(path)
+            lengths.append(len(chunk))
+        return cls(paths, lengths, workdir, n_jobs)
+
+    @classmethod
+    def from_frame(cls, df, workdir, partition_rows=DEFAULT_PARTITION_ROWS, n_jobs=None):
+        chunks = (df.iloc[start:start + partition_rows] for start in range(0, len(df), partition_rows))
+        return cls.from_chunks(chunks, workdir, n_jobs)
+
+    @classmethod
+    def from_csv(cls, path, workdir, partition_rows=DEFAULT_PARTITION_ROWS, n_jobs=None, **read_kwargs):
+        """Read a CSV in chunks; the row index continues across partitions as in read_csv"""
+        return cls.from_chunks(pd.read_csv(path, chunksize=partition_rows, **read_kwargs), workdir, n_jobs)
+
+    def __len__(self):
+        return sum(self.lengths)
+
+    @property
+    def n_partitions(self):
+        return len(self.paths)
+
+    @property
+    def columns(self):
+        return _load(self.paths[0]).columns if self.paths else pd.Index([])
+
+    def partitions(self):
+        """Iterate over the partitions as DataFrames"""
+        for path in self.paths:
+            yield _load(path)
+
+    def to_pandas(self):
+        return pd.concat(list(self.partitions())) if self.paths else pd.DataFrame()
+
+    def delete(self):
+        """Remove this frame's partition files"""
+        directories = {os.path.dirname(p) for p in self.paths}
+        for directory in directories:
+            shutil.rmtree(directory, ignore_errors=True)
+        self.paths, self.lengths = [], []
+
+    # Running tasks
+
+    def _map(self, function, tasks):
+        if self.n_jobs == 1 or len(tasks) <= 1:
+            return [function(task) for task in tasks]
+        with ProcessPoolExecutor(max_workers=self.n_jobs) as pool:
+            return list(pool.map(function, tasks))
+
+    def map_partitions(self, func, *args, per_partition_args=None):
+        """
+        New PartitionedFrame with func(partition, *args) applied to every partition.
+
+        func must be a top-level function (worker processes import it).
+        per_partition_args is an optional list with one tuple of extra
+        arguments per partition.
+        """
+        directory = tempfile.mkdtemp(prefix='part_', dir=self.workdir)
+        tasks = [(path, os.path.join(directory, f'{i:06d}.pkl'), func,
+                  args + (per_partition_args[i] if per_partition_args else ()))
+                 for i, path in enumerate(self.paths)]
+        lengths = self._map(_apply_task, tasks)
+        return PartitionedFrame([t[1] for t in tasks], lengths, self.workdir, self.n_jobs)
+
+    def reduce_partitions(self, func, *args):
+        """func(partition, *args) for every partition, as a list"""
+        return self._map(_reduce_task, [(path, func, args) for path in self.paths])
+
+    # Global statistics
+
+    def isnull_sum(self):
+        counts = self.reduce_partitions(_null_counts)
+        return sum(counts[1:], counts[0]) if counts else pd.Series(dtype='int64')
+
+    def violation_counts(self, rules):
+        """Rule violation counts (see cleaningTools.validate_rules) over all partitions"""
+        counts = self.reduce_partitions(_violation_counts, rules)
+        return sum(counts[1:], counts[0])
+
+    def value_counts(self, column):
+        counts = self.reduce_partitions(_value_counts, column)
+        total = pd.concat(counts).groupby(level=0, dropna=False, sort=False).sum()
+        return total.sort_values(ascending=False, kind='stable')
+
+    def _select(self, column, rank, n):
+        """
+        Sorted values of the bucket holding position rank of the sorted non-missing values.
+
+        Returns (values, below, bucket_count, prefix, known_bits): below values
+        sort before the bucket and bucket_count lie in it. A bucket holding a
+        single key (constant or low-cardinality columns) is not gathered:
+        values is then just that one value.
+        """
+        prefix, known_bits, below = 0, 0, 0
+        bucket_count = n
+        while bucket_count > GATHER_LIMIT:
+            results = self.reduce_partitions(_radix_histogram, column, prefix, known_bits)
+            ranges = [r for _, r in results if r is not None]
+            if min(r[0] for r in ranges) == max(r[1] for r in ranges):
+                return np.array([ranges[0][2]]), below, bucket_count, prefix, known_bits
+            histogram = sum(h for h, _ in results)
+            cumulative = np.cumsum(histogram)
+            digit = int(np.searchsorted(cumulative, rank - below, side='right'))
+            below += int(cumulative[digit - 1]) if digit > 0 else 0
+            bucket_count = int(histogram[digit])
+            prefix = (prefix << RADIX_BITS) | digit
+            known_bits += RADIX_BITS
+        values = np.sort(np.concatenate(self.reduce_partitions(_bucket_values, column, prefix, known_bits)))
+        return values, below, bucket_count, prefix, known_bits
+
+    def _order_statistics(self, column, low, high):
+        """Values at sorted positions low and high (high is low or low + 1)"""
+        n = sum(self.reduce_partitions(_count_valid, column))
+        values, below, bucket_count, prefix, known_bits = self._select(column, low, n)
+        single = len(values) < bucket_count
+        a = values[0 if single else low - below]
+        if high - below < bucket_count:
+            return a, values[0 if single else high - below]
+        # The next value lies past the gathered bucket: the smallest value above it
+        candidates = [v for v in self.reduce_partitions(_min_above_bucket, column, prefix, known_bits)
+                      if v is not None]
+        return a, min(candidates)
+
+    def quantile(self, column, q):
+        """Same as df[column].quantile(q) (linear interpolation)"""
+        n = sum(self.reduce_partitions(_count_valid, column))
+        if n == 0:
+            return np.nan
+        # numpy's virtual index for the 'linear' method
+        position = q * (n - 1)
+        low = int(math.floor(position))
+        high = min(low + 1, n - 1)
+        a, b = self._order_statistics(column, low, high)
+        return _lerp(np.float64(a), np.float64(b), position - low)
+
+    def median(self, column):
+        """Same as df[column].median()"""
+        n = sum(self.reduce_partitions(_count_valid, column))
+        if n == 0:
+            return np.nan
+        a, b = self._order_statistics(column, (n - 1) // 2, n // 2)
+        return np.float64(a) if n % 2 else np.mean([np.float64(a), np.float64(b)])
+
+    def mean(self, column):
+        """Global mean (partition sums are added, so the last digits can differ from pandas)"""
+        sums = self.reduce_partitions(_sum_valid, column)
+        n = sum(self.reduce_partitions(_count_valid, column))
+        return np.float64(sum(sums)) / n if n else np.nan
+
+    # Cleaning operations
+
+    def fillna(self, column, value):
+        """Fill missing values with a constant, 'median' or 'mean' (global)"""
+        if isinstance(value, str) and value in ('median', 'mean'):
+            value = getattr(self, value)(column)
+        return self.map_partitions(_fillna, column, value)
+
+    def str_method(self, column, method):
+        """Apply a string method, e.g. 'title' or 'lower'"""
+        return self.map_partitions(_str_method, column, method)
+
+    def to_datetime(self, column, target=None, format='mixed'):
+        return self.map_partitions(_to_datetime, column, target or column, format)
+
+    def replace_where(self, column, condition, value):
+        """Set column to value ('median'/'mean' allowed) where a (column, op, value) condition holds"""
+        if isinstance(value, str) and value in ('median', 'mean'):
+            value = getattr(self, value)(column)
+        return self.map_partitions(_replace_where, column, condition, value)
+
+    def clip(self, column, lower=None, upper=None):
+        return self.map_partitions(_clip, column, lower, upper)
+
+    def clip_iqr(self, column, k=1.5):
+        """Clip to [Q1 - k*IQR, Q3 + k*IQR] with global quartiles, as in clean_data()"""
+        q1, q3 = self.quantile(column, 0.25), self.quantile(column, 0.75)
+        iqr = q3 - q1
+        return self.clip(column, lower=q1 - k * iqr, upper=q3 + k * iqr)
+
+    # Fills that cross partition boundaries
+
+    def ffill(self, column):
+        edges = self.reduce_partitions(_edges, column)
+        carries, carry = [], None
+        for edge in edges:
+            carries.append((carry,))
+            if edge is not None:
+                carry = edge[2]
+        return self.map_partitions(_ffill, column, per_partition_args=carries)
+
+    def bfill(self, column):
+        edges = self.reduce_partitions(_edges, column)
+        carries, carry = [], None
+        for edge in reversed(edges):
+            carries.append((carry,))
+            if edge is not None:
+                carry = edge[0]
+        return self.map_partitions(_bfill, column, per_partition_args=carries[::-1])
+
+    def interpolate(self, column):
+        """Linear interpolation over row positions, same as df[column].interpolate()"""
+        edges = self.reduce_partitions(_edges, column)
+        offsets = np.concatenate([[0], np.cumsum(self.lengths)[:-1]]).astype('int64')
+        before, previous = [], None
+        for edge, offset in zip(edges, offsets):
+            before.append(previous)
+            if edge is not None:
+                previous = (int(offset) + edge[3], float(edge[2]))
+        after, following = [], None
+        for edge, offset in zip(edges[::-1], offsets[::-1]):
+            after.append(following)
+            if edge is not None:
+                following = (int(offset) + edge[1], float(edge[0]))
+        args = [(int(o), b, a) for o, b, a in zip(offsets, before, after[::-1])]
+        return self.map_partitions(_interpolate, column, per_partition_args=args)
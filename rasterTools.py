@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Aggregate large point sets into a fixed-size density grid before plotting.
+
+A scatter trace carries every point into the figure JSON (and the HTML
+file), so a few million rows of outcomes_df or the full climate data make
+a figure that is hundreds of megabytes and slow to draw. A Rasterizer bins
+the points into a width x height grid with NumPy and embeds only the grid
+as a heatmap trace, so the figure size depends on the resolution, not on
+the number of points:
+
+    raster = Rasterizer(df['Resources Index'], df['Math Score'], width=300, height=200)
+    builder.add_trace(raster.trace(), row=1, col=2)      # a heatmap of counts
+
+    # Interactive: zooming re-bins only the visible points at full resolution
+    fig = raster.figure_widget()
+
+The points are sorted by x once, so a zoomed view slices the visible rows
+with a binary search instead of scanning all of them.
+"""
+
+import numpy as np
+
+AGGREGATIONS = ('count', 'sum', 'mean')
+
+
+def _bin_index(values, lo, hi, n):
+    """Bin number (0..n-1) of each value in [lo, hi]"""
+    if hi <= lo:
+        return np.zeros(len(values), dtype=np.intp)
+    index = ((values - lo) * (n / (hi - lo))).astype(np.intp)
+    # The upper edge belongs to the last bin, like np.histogram
+    return np.minimum(index, n - 1)
+
+
+def _extent(values):
+    """(min, max) of the finite values; (0, 1) when there are none"""
+    values = values[np.isfinite(values)]
+    return (np.nanmin(values), np.nanmax(values)) if len(values) else (0.0, 1.0)
+
+
+def bin_points(x, y, width=400, height=300, x_range=None, y_range=None, weights=None, agg='count'):
+    """
+    2D histogram of the points (x, y) on a height x width grid.
+
+    x_range, y_range: (low, high) of the grid; the data extent when omitted
+    weights, agg: 'count' counts points, 'sum' and 'mean' aggregate weights
+
+    Returns (grid, x_edges, y_edges); grid[i, j] is the cell of y bin i and
+    x bin j. Cells without points are NaN for 'mean'.
+    """
+    if agg not in AGGREGATIONS:
+        raise ValueError(f"agg must be one of {AGGREGATIONS}, got {agg!r}")
+    if agg != 'count' and weights is None:
+        raise ValueError(f"agg='{agg}' needs weights")
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    x0, x1 = x_range if x_range is not None else _extent(x)
+    y0, y1 = y_range if y_range is not None else _extent(y)
+    inside = (x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)
+    if weights is not None:
+        weights = np.asarray(weights, dtype=float)[inside]
+    x, y = x[inside], y[inside]
+    # One flat bin number per point, then a single bincount (no per-cell work)
+    cells = _bin_index(y, y0, y1, height) * width + _bin_index(x, x0, x1, width)
+    counts = np.bincount(cells, minlength=width * height).reshape(height, width)
+    if agg == 'count':
+        grid = counts.astype(float)
+    else:
+        grid = np.bincount(cells, weights=weights, minlength=width * height).reshape(height, width)
+        if agg == 'mean':
+            with np.errstate(invalid='ignore', divide='ignore'):
+                grid = np.where(counts > 0, grid / counts, np.nan)
+    return grid, np.linspace(x0, x1, width + 1), np.linspace(y0, y1, height + 1)
+
+
+class Rasterizer:
+    """
+    Points binned into a heatmap, re-binned for each zoomed view.
+
+    Parameters:
+        x, y: point coordinates (non-finite points are dropped)
+        weights: optional values aggregated with agg ('sum' or 'mean')
+        width, height: grid resolution in cells
+        agg: 'count', 'sum' or 'mean'
+        log_x, log_y: bin in log10 space (for log axes)
+        log: color by log10 of the aggregate (counts often span orders of magnitude)
+    """
+
+    def __init__(self, x, y, weights=None, width=400, height=300, agg='count',
+                 log_x=False, log_y=False, log=False):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        if log_x:
+            x = np.log10(np.where(x > 0, x, np.nan))
+        if log_y:
+            y = np.log10(np.where(y > 0, y, np.nan))
+        keep = np.isfinite(x) & np.isfinite(y)
+        if weights is not None:
+            weights = np.asarray(weights, dtype=float)
+            keep &= np.isfinite(weights)
+        # Sorted by x once; a view's rows are then one contiguous slice
+        order = np.argsort(x[keep], kind='stable')
+        self.x = x[keep][order]
+        self.y = y[keep][order]
+        self.weights = weights[keep][order] if weights is not None else None
+        self.width, self.height = width, height
+        self.agg = agg
+        self.log_x, self.log_y = log_x, log_y
+        self.log = log
+        self.extent = ((self.x[0], self.x[-1]) if len(self.x) else (0.0, 1.0),
+                       (self.y.min(), self.y.max()) if len(self.y) else (0.0, 1.0))
+
+    def __len__(self):
+        return len(self.x)
+
+    def _to_bins(self, bounds, log):
+        return None if bounds is None else tuple(np.log10(bounds) if log else bounds)
+
+    def aggregate(self, x_range=None, y_range=None):
+        """
+        (z, x_centers, y_centers) of the grid over the given data ranges
+        (the full extent when omitted), in axis units
+        """
+        x_range = self._to_bins(x_range, self.log_x) or self.extent[0]
+        y_range = self._to_bins(y_range, self.log_y) or self.extent[1]
+        start = np.searchsorted(self.x, x_range[0], side='left')
+        stop = np.searchsorted(self.x, x_range[1], side='right')
+        weights = self.weights[start:stop] if self.weights is not None else None
+        grid, x_edges, y_edges = bin_points(self.x[start:stop], self.y[start:stop], self.width, self.height,
+                                            x_range, y_range, weights, self.agg)
+        if self.agg != 'mean':
+            # Empty cells are left transparent instead of drawn as zero
+            grid[grid == 0] = np.nan
+        if self.log:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                grid = np.log10(grid)
+        x_centers = (x_edges[:-1] + x_edges[1:]) / 2
+        y_centers = (y_edges[:-1] + y_edges[1:]) / 2
+        return (grid,
+                10 ** x_centers if self.log_x else x_centers,
+                10 ** y_centers if self.log_y else y_centers)
+
+    def trace(self, x_range=None, y_range=None, **heatmap):
+        """Heatmap trace dict of the grid (pass to DashboardBuilder.add_trace or go.Figure)"""
+        z, x_centers, y_centers = self.aggregate(x_range, y_range)
+        label = self.agg if self.weights is not None else 'count'
+        trace = {'type': 'heatmap', 'x': x_centers, 'y': y_centers, 'z': z,
+                 'colorscale': 'Viridis', 'hoverongaps': False,
+                 'colorbar': {'title': {'text': f'log10({label})' if self.log else label}}}
+        trace.update(heatmap)
+        return trace
+
+    def figure_widget(self, **layout):
+        """
+        go.FigureWidget showing the grid; zooming or panning re-bins the
+        visible points (needs a Jupyter environment with anywidget)
+        """
+        import plotly.graph_objects as go
+
+        fig = go.FigureWidget(data=[self.trace()], layout=layout)
+        if self.log_x:
+            fig.layout.xaxis.type = 'log'
+        if self.log_y:
+            fig.layout.yaxis.type = 'log'
+        heatmap = fig.data[0]
+
+        def rebin(layout, x_range, y_range):
+            # Log axes report their range in log10 units
+            x_range = None if x_range is None else tuple(10 ** np.asarray(x_range)) if self.log_x else x_range
+            y_range = None if y_range is None else tuple(10 ** np.asarray(y_range)) if self.log_y else y_range
+            z, x_centers, y_centers = self.aggregate(x_range, y_range)
+            with fig.batch_update():
+                heatmap.z, heatmap.x, heatmap.y = z, x_centers, y_centers
+
+        fig.layout.on_change(rebin, 'xaxis.range', 'yaxis.range')
+        return fig
@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Batch rendering of matplotlib charts to image files in worker processes.
+
+The notebooks draw each chart in the main process and plt.show() it. For a
+report, render_charts() takes a list of ChartSpecs and writes them as
+PNG/SVG/PDF files from a pool of worker processes on the Agg backend:
+
+    specs = [ChartSpec('price_hist', draw_price_hist, df, figsize=(10, 6)),
+             ChartSpec.from_figure('missing_pattern', plt.gcf())]
+    render_charts(specs, 'report', formats=('png', 'svg'))
+
+A spec is either a draw function (pyplot style, run in the worker) with its
+arguments, or an already built figure, which is pickled and only rendered
+(laid out, rasterized and encoded) in the worker; that is where nearly all
+of savefig's time goes.
+
+Each worker starts once with the caller's rcParams (style, palette, fonts)
+and loads the font cache by rendering a small text figure; the following
+charts reuse the fonts matplotlib has already found and loaded.
+
+In the notebooks, a ChartReport collects the charts as they are shown and
+renders them at the end when the REPORT_DIR environment variable is set:
+
+    chart_report = ChartReport()
+    ...
+    chart_report.add('missing_pattern')  # before plt.show()
+    plt.show()
+    ...
+    chart_report.render()              # REPORT_DIR=report python "9. MissingData.py"
+"""
+
+import multiprocessing
+import os
+import pickle
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+
+DEFAULT_FORMATS = ('png',)
+
+# rcParams that are not part of a chart's style
+_RC_SKIPPED = ('backend', 'backend_fallback', 'interactive')
+
+
+class ChartSpec:
+    """
+    One chart to render.
+
+    Parameters:
+        name: file name without extension
+        draw: function drawing the chart with pyplot (module level or
+              defined in the notebook), called as draw(*args, **kwargs)
+              on a new figure of size figsize
+        formats: file formats to write (default: the formats passed to render_charts)
+        dpi: resolution of raster formats (default: the savefig.dpi rcParam)
+    """
+
+    def __init__(self, name, draw, *args, figsize=(10, 6), formats=None, dpi=None, **kwargs):
+        self.name = name
+        self.draw = draw
+        self.args = args
+        self.kwargs = kwargs
+        self.figsize = figsize
+        self.formats = formats
+        self.dpi = dpi
+        self.figure = None
+
+    @classmethod
+    def from_figure(cls, name, fig, formats=None, dpi=None):
+        """Spec of an existing figure, pickled now so later changes to it don't leak in"""
+        spec = cls(name, None, formats=formats, dpi=dpi)
+        spec.figure = pickle.dumps(fig, protocol=pickle.HIGHEST_PROTOCOL)
+        return spec
+
+    def __repr__(self):
+        source = 'figure' if self.figure is not None else getattr(self.draw, '__name__', repr(self.draw))
+        return f'ChartSpec({self.name!r}, {source})'
+
+
+# Workers
+# ========
+
+def current_style():
+    """The rcParams that make up the current style, as a plain dict"""
+    return {key: value for key, value in matplotlib.rcParams.items() if key not in _RC_SKIPPED}
+
+
+def _init_worker(rc):
+    matplotlib.use('Agg', force=True)
+    with warnings.catch_warnings():
+        # Deprecated rcParams are copied over as they are
+        warnings.simplefilter('ignore')
+        matplotlib.rcParams.update(rc)
+    import matplotlib.pyplot as plt
+
+    # Load the font files once; every chart this worker renders reuses them
+    fig = plt.figure(figsize=(1, 1))
+    fig.text(0.5, 0.5, 'Aa0', weight='bold')
+    fig.text(0.5, 0.2, 'Aa0')
+    fig.canvas.draw()
+    plt.close(fig)
+
+
+def _save(fig, path, fmt, dpi):
+    # Write next to the target and rename, so a reader never sees a partial file
+    tmp = f'{path}.{os.getpid()}.tmp'
+    try:
+        fig.savefig(tmp, format=fmt, dpi=dpi if dpi is not None else 'figure')
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _render_task(task):
+    spec, directory, formats = task
+    import matplotlib.pyplot as plt
+
+    before = set(plt.get_fignums())
+    try:
+        if spec.figure is not None:
+            fig = pickle.loads(spec.figure)
+        else:
+            plt.figure(figsize=spec.figsize)
+            spec.draw(*spec.args, **spec.kwargs)
+            # The draw function may have made its own figure (plt.subplots)
+            fig = plt.gcf()
+        paths = []
+        for fmt in spec.formats or formats:
+            path = os.path.join(directory, f'{spec.name}.{fmt}')
+            _save(fig, path, fmt, spec.dpi)
+            paths.append(path)
+        return spec.name, paths
+    finally:
+        # Close only the figures made here (in-process rendering leaves the caller's alone)
+        for number in set(plt.get_fignums()) - before:
+            plt.close(number)
+        if spec.figure is not None:
+            plt.close(fig)
+
+
+# Rendering
+# ==========
+
+def render_charts(specs, directory, formats=DEFAULT_FORMATS, n_jobs=None, rc=None):
+    """
+    Render every spec to directory/<name>.<format>.
+
+    formats: default file formats for specs without their own
+    n_jobs: worker processes (None: one per CPU, 1: render in this process)
+    rc: rcParams for the charts (default: the current style)
+
+    Returns {name: [paths written]}.
+    """
+    os.makedirs(directory, exist_ok=True)
+    rc = current_style() if rc is None else rc
+    tasks = [(spec, directory, formats) for spec in specs]
+    if n_jobs == 1 or len(tasks) <= 1:
+        with matplotlib.rc_context(rc):
+            return dict(_render_task(task) for task in tasks)
+    workers = n_jobs or os.cpu_count() or 1
+    # Draw functions defined in a notebook can only be sent to workers that are forked from it
+    context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(rc,)) as pool:
+        # Several charts per round trip, so thousands of small charts don't wait on IPC
+        chunksize = max(1, len(tasks) // (workers * 4))
+        return dict(pool.map(_render_task, tasks, chunksize=chunksize))
+
+
+class ChartReport:
+    """
+    Charts collected while a notebook runs, rendered together at the end.
+
+    Parameters:
+        formats: file formats to write
+        n_jobs: worker processes for render() (None: one per CPU)
+        enabled: collect figures in add() (default: when REPORT_DIR is set,
+                 so interactive runs don't pay for pickling the figures)
+    """
+
+    def __init__(self, formats=DEFAULT_FORMATS, n_jobs=None, enabled=None):
+        self.formats = formats
+        self.n_jobs = n_jobs
+        self.specs = []
+        self.enabled = bool(os.environ.get('REPORT_DIR')) if enabled is None else enabled
+
+    def add(self, name, fig=None):
+        """Add the current figure (or fig); call it before plt.show()"""
+        if self.enabled:
+            import matplotlib.pyplot as plt
+            self.specs.append(ChartSpec.from_figure(name, fig if fig is not None else plt.gcf()))
+        return self
+
+    def add_chart(self, name, draw, *args, **kwargs):
+        """Add a chart drawn by draw(*args, **kwargs) at render time (see ChartSpec)"""
+        self.specs.append(ChartSpec(name, draw, *args, **kwargs))
+        return self
+
+    def render(self, directory=None):
+        """Render the charts into directory (default: $REPORT_DIR; nothing happens without one)"""
+        directory = directory or os.environ.get('REPORT_DIR')
+        if not directory or not self.specs:
+            return None
+        start = time.perf_counter()
+        written = render_charts(self.specs, directory, self.formats, self.n_jobs)
+        print(f"Rendered {len(written)} charts to {directory} in {time.perf_counter() - start:.2f}s")
+        return written
@@ -0,0 +1,320 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Stage-level timing for the notebook pipelines.
+
+The scripts report progress with print() only (print_section in
+3. JSONHandling.py, the numbered steps of clean_data() in 7. DataClean.py).
+This module records, for every stage:
+
+    - wall time and CPU time
+    - rows in and rows out
+    - change in resident memory (RSS)
+
+and sends each record to a sink: the log, a JSON Lines file or an
+in-memory table.
+
+    with stage('1. Handling missing values', rows_in=len(df)) as s:
+        ...
+        s.rows_out = len(df)
+
+    @profiled()
+    def clean_data(df):
+        ...
+
+Profiling is off unless enabled, either in code with enable(...) or with
+the PIPELINE_PROFILE environment variable ('log', 'memory' or a .json/.jsonl
+path). While disabled, stage() hands back one shared do-nothing object, so
+instrumented code costs about one attribute lookup per stage.
+"""
+
+import functools
+import json
+import logging
+import os
+import sys
+import time
+
+import pandas as pd
+
+
+# Sinks
+# ======
+
+class MemorySink:
+    """Keep records in a list; table() returns them as a DataFrame"""
+
+    def __init__(self):
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def table(self):
+        return pd.DataFrame(self.records)
+
+    def clear(self):
+        self.records.clear()
+
+
+class LogSink:
+    """Write one log line per stage through the logging module"""
+
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger or logging.getLogger('stageProfiler')
+        self.level = level
+
+    def emit(self, record):
+        rows = ''
+        if record['rows_in'] is not None or record['rows_out'] is not None:
+            rows = f" rows {record['rows_in']} -> {record['rows_out']}"
+        self.logger.log(self.level, "%s: wall %.4fs, cpu %.4fs, mem %+.1fMB%s",
+                        record['path'], record['wall_s'], record['cpu_s'],
+                        record['mem_delta_mb'], rows)
+
+
+class JSONSink:
+    """Append records to a JSON Lines file (one JSON object per line)"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def emit(self, record):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, default=str) + '\n')
+
+
+def make_sink(spec):
+    """
+    Build a sink from a short description.
+
+    'log' -> LogSink, 'memory' -> MemorySink, anything ending in .json or
+    .jsonl -> JSONSink for that path. Objects with an emit() method are
+    returned unchanged.
+    """
+    if hasattr(spec, 'emit'):
+        return spec
+    if spec == 'log':
+        return LogSink()
+    if spec == 'memory':
+        return MemorySink()
+    if isinstance(spec, str) and spec.lower().endswith(('.json', '.jsonl')):
+        return JSONSink(spec)
+    raise ValueError(f"Unknown profiling sink '{spec}'. Expected 'log', 'memory' or a .json/.jsonl path")
+
+
+# Measurements
+# =============
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def _current_rss_mb():
+    """Current resident memory of this process in MB (peak RSS where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / 1024**2
+    except OSError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in KB elsewhere
+        return peak / 1024**2 if sys.platform == 'darwin' else peak / 1024
+
+
+def _row_count(obj):
+    """Number of rows of a DataFrame, Series, array or list; None for anything else"""
+    shape = getattr(obj, 'shape', None)
+    if shape:
+        return int(shape[0])
+    if isinstance(obj, (list, tuple)):
+        return len(obj)
+    return None
+
+
+# Stages
+# =======
+
+class Stage:
+    """One running stage. Set rows_out (and rows_in) on it inside the with block."""
+
+    __slots__ = ('profiler', 'name', 'rows_in', 'rows_out', 'path', 'depth',
+                 '_start', '_wall', '_cpu', '_rss')
+
+    def __init__(self, profiler, name, rows_in=None, rows_out=None):
+        self.profiler = profiler
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = rows_out
+
+    def __enter__(self):
+        stack = self.profiler._stack
+        self.path = '/'.join([s.name for s in stack] + [self.name])
+        self.depth = len(stack)
+        stack.append(self)
+        self._start = time.time()
+        self._rss = _current_rss_mb()
+        self._cpu = time.process_time()
+        self._wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        rss = _current_rss_mb()
+        self.profiler._stack.remove(self)
+        self.profiler._emit({
+            'stage': self.name,
+            'path': self.path,
+            'depth': self.depth,
+            'start': self._start,
+            'wall_s': wall,
+            'cpu_s': cpu,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'mem_delta_mb': rss - self._rss,
+            'rss_mb': rss,
+            'error': exc_type.__name__ if exc_type is not None else None,
+        })
+        return False
+
+
+class _NullStage:
+    """Stand-in used while profiling is disabled: accepts attributes, records nothing"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Profiler:
+    """
+    Collect stage records and pass them to one or more sinks.
+
+    Parameters:
+        sinks: sink, sink description (see make_sink) or list of them
+        enabled: start enabled (defaults to True when sinks are given)
+    """
+
+    def __init__(self, sinks=None, enabled=None):
+        self.sinks = []
+        self._stack = []
+        self._section = None
+        if sinks is not None:
+            self.add_sink(sinks)
+        self.enabled = bool(self.sinks) if enabled is None else enabled
+
+    def add_sink(self, sinks):
+        if isinstance(sinks, (list, tuple)):
+            for sink in sinks:
+                self.add_sink(sink)
+        else:
+            self.sinks.append(make_sink(sinks))
+        return self
+
+    def _emit(self, record):
+        for sink in self.sinks:
+            sink.emit(record)
+
+    def stage(self, name, rows_in=None, rows_out=None):
+        """Context manager timing the block inside it"""
+        if not self.enabled:
+            return _NULL_STAGE
+        return Stage(self, name, rows_in=rows_in, rows_out=rows_out)
+
+    def profiled(self, name=None):
+        """
+        Decorator timing every call of a function.
+
+        rows_in is taken from the first argument and rows_out from the
+        return value when they are DataFrames, Series, arrays or lists.
+        """
+        def decorator(func):
+            stage_name = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with Stage(self, stage_name, rows_in=_row_count(args[0]) if args else None) as s:
+                    result = func(*args, **kwargs)
+                    s.rows_out = _row_count(result)
+                return result
+            return wrapper
+        return decorator
+
+    def section(self, name, rows_in=None):
+        """
+        Start a section that lasts until the next section() or end_section().
+
+        For scripts split into cells, where a with block would have to wrap
+        a whole cell.
+        """
+        self.end_section()
+        if self.enabled:
+            self._section = Stage(self, name, rows_in=rows_in).__enter__()
+
+    def end_section(self, rows_out=None):
+        if self._section is not None:
+            section, self._section = self._section, None
+            if rows_out is not None:
+                section.rows_out = rows_out
+            section.__exit__(None, None, None)
+
+    def table(self):
+        """Records of the first in-memory sink as a DataFrame"""
+        for sink in self.sinks:
+            if isinstance(sink, MemorySink):
+                return sink.table()
+        return pd.DataFrame()
+
+
+# Module-level profiler
+# ======================
+
+default_profiler = Profiler()
+
+
+def enable(sinks='memory'):
+    """Turn on the module-level profiler with the given sinks"""
+    default_profiler.sinks = []
+    default_profiler.add_sink(sinks)
+    default_profiler.enabled = True
+    if any(isinstance(sink, LogSink) for sink in default_profiler.sinks):
+        # Scripts don't configure logging themselves, so make INFO lines visible
+        logging.basicConfig(level=logging.INFO, format='%(name)s %(message)s')
+    return default_profiler
+
+
+def disable():
+    default_profiler.end_section()
+    default_profiler.enabled = False
+
+
+def stage(name, rows_in=None, rows_out=None):
+    return default_profiler.stage(name, rows_in=rows_in, rows_out=rows_out)
+
+
+def profiled(name=None):
+    return default_profiler.profiled(name)
+
+
+def section(name, rows_in=None):
+    default_profiler.section(name, rows_in=rows_in)
+
+
+def end_section(rows_out=None):
+    default_profiler.end_section(rows_out=rows_out)
+
+
+def profile_table():
+    return default_profiler.table()
+
+
+if os.environ.get('PIPELINE_PROFILE'):
+    enable(os.environ['PIPELINE_PROFILE'].split(','))
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Memoize pipeline steps on the content of their inputs.
+
+Every run of 10_allTogether.py or the cleaning notebooks recomputes each
+step from scratch, even when its inputs are exactly the same as last time.
+A step decorated with StepCache.step() is keyed on:
+
+    - a content hash of every argument (DataFrames, Series, arrays, lists,
+      dicts and scalars; anything else is pickled and hashed)
+    - the step's name and source code, so editing the step invalidates it
+
+Results are pickled to a cache directory that is kept under a size limit
+by evicting the least recently used entries. Because each step's key comes
+from its inputs, a change only recomputes the steps that receive changed
+data; everything upstream of it (and any unaffected branch) is read back.
+
+    cache = StepCache('.step_cache')
+
+    @cache.step()
+    def fit_trend_line(x, y, degree=1):
+        return np.polyfit(x, y, degree)
+"""
+
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MAX_BYTES = 256 * 1024**2
+
+
+# Content hashing
+# ================
+
+def _update_hash(h, obj):
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        h.update(type(obj).__name__.encode())
+        if isinstance(obj, pd.DataFrame):
+            h.update(repr(list(obj.columns)).encode())
+            h.update(repr(list(obj.dtypes.astype(str))).encode())
+        else:
+            h.update(repr((obj.name, str(obj.dtype))).encode())
+        # One vectorized pass: a uint64 per row covering index and values
+        h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif isinstance(obj, pd.Index):
+        h.update(b'Index' + str(obj.dtype).encode())
+        h.update(pd.util.hash_pandas_object(obj).to_numpy().tobytes())
+    elif isinstance(obj, np.ndarray):
+        h.update(repr((obj.dtype.str, obj.shape)).encode())
+        if obj.dtype.kind == 'O':
+            h.update(pickle.dumps(obj.tolist(), protocol=4))
+        else:
+            h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, (list, tuple)):
+        h.update(f'{type(obj).__name__}{len(obj)}'.encode())
+        for item in obj:
+            _update_hash(h, item)
+    elif isinstance(obj, dict):
+        h.update(f'dict{len(obj)}'.encode())
+        for key in sorted(obj, key=repr):
+            _update_hash(h, key)
+            _update_hash(h, obj[key])
+    elif obj is None or isinstance(obj, (bool, int, float, complex, str, bytes, np.generic)):
+        h.update(f'{type(obj).__name__}:{obj!r}'.encode())
+    else:
+        h.update(pickle.dumps(obj, protocol=4))
+
+
+def content_hash(*objs):
+    """Hex digest of the content of the given objects"""
+    h = hashlib.blake2b(digest_size=20)
+    for obj in objs:
+        _update_hash(h, obj)
+    return h.hexdigest()
+
+
+def _step_fingerprint(func):
+    """Name plus source code (byte code when the source isn't available)"""
+    try:
+        source = inspect.getsource(func)
+    except (OSError, TypeError):
+        source = func.__code__.co_code.hex()
+    return f'{func.__module__}.{func.__qualname__}\n{source}'
+
+
+# Cache
+# ======
+
+class StepCache:
+    """
+    On-disk, size-bounded LRU cache of step results.
+
+    Parameters:
+        directory: where results are stored (created when needed)
+        max_bytes: total size kept on disk; least recently used entries go first
+        enabled: False runs every step without caching
+    """
+
+    def __init__(self, directory='.step_cache', max_bytes=DEFAULT_MAX_BYTES, enabled=True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.pkl')
+
+    def get(self, key):
+        """(True, value) on a hit, (False, None) on a miss"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return False, None
+        # Touch the file so eviction sees it as recently used
+        os.utime(path)
+        return True, value
+
+    def put(self, key, value):
+        os.makedirs(self.directory, exist_ok=True)
+        # Write to a temporary file first so readers never see half an entry
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self.evict()
+
+    def entries(self):
+        """(path, size, last used) of every entry, oldest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        entries = [(e.path, e.stat().st_size, e.stat().st_mtime)
+                   for e in os.scandir(self.directory) if e.name.endswith('.pkl')]
+        return sorted(entries, key=lambda e: e[2])
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        for path, _, _ in self.entries():
+            os.remove(path)
+
+    def step(self, name=None):
+        """Decorator caching a function's results on the content of its arguments"""
+        def decorator(func):
+            fingerprint = (name or '') + _step_fingerprint(func)
+            signature = inspect.signature(func)
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                # Bind so f(x, 1) and f(x, degree=1) share a key
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                key = content_hash(fingerprint, dict(bound.arguments))
+                hit, value = self.get(key)
+                if hit:
+                    self.hits += 1
+                    return value
+                self.misses += 1
+                value = func(*args, **kwargs)
+                self.put(key, value)
+                return value
+            wrapper.cache = self
+            return wrapper
+        return decorator
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'entries': len(self.entries()), 'bytes': self.size()}
@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Streaming least-squares trend lines.
+
+np.polyfit(x, y, degree) needs every point in memory at once. A
+TrendAccumulator keeps only a small summary of the points seen so far and
+fits the same polynomial from it:
+
+    trend = TrendAccumulator(degree=1)
+    for chunk in pd.read_csv(path, chunksize=100_000):
+        trend.update(chunk['Resources Index'], chunk['Math Score'])
+    coefficients = trend.coefficients()          # same order as np.polyfit
+    x_line, y_line = trend.line()
+
+The summary is the triangular factor R of the QR decomposition of
+[1, x, ..., x^degree | y] (a (degree + 2)-square matrix). Adding a chunk or
+merging two accumulators is one small QR of the stacked factors, so:
+
+    - memory does not grow with the number of points
+    - accumulators built in separate processes (or on separate partitions,
+      see accumulate() with PartitionedFrame.reduce_partitions) merge into
+      exactly the fit of all their points
+    - new rows update an existing fit without revisiting the old ones
+
+Working on R of a centered and scaled x, rather than on sums of raw powers
+of x, keeps the fit as accurate as np.polyfit. GroupedTrend keeps one
+accumulator per group.
+"""
+
+import functools
+import math
+
+import numpy as np
+import pandas as pd
+from numpy.polynomial import Polynomial
+
+
+class TrendAccumulator:
+    """
+    Mergeable least-squares polynomial fit.
+
+    Parameters:
+        degree: polynomial degree (1 for a straight trend line)
+    """
+
+    def __init__(self, degree=1):
+        self.degree = degree
+        self.n = 0
+        self.r = np.zeros((0, degree + 2))
+        # Powers are taken of (x - shift) / scale, fixed by the first points seen
+        self.shift, self.scale = 0.0, 1.0
+        self.x_min, self.x_max = np.inf, -np.inf
+        self.y_sum = 0.0
+        self.y_sq_sum = 0.0
+
+    def _absorb(self, rows):
+        self.r = np.linalg.qr(np.vstack([self.r, rows]), mode='r')
+
+    def _basis(self, x):
+        return np.vander((x - self.shift) / self.scale, self.degree + 1, increasing=True)
+
+    def _rebased(self, other):
+        """other's factor in this accumulator's (shift, scale) basis"""
+        if (other.shift, other.scale) == (self.shift, self.scale):
+            return other.r
+        # u_other = alpha * u_self + beta, so every power of u_other is a binomial sum of powers of u_self
+        alpha = self.scale / other.scale
+        beta = (self.shift - other.shift) / other.scale
+        k = self.degree + 1
+        change = np.eye(k + 1)
+        for j in range(k):
+            for i in range(j + 1):
+                change[i, j] = math.comb(j, i) * alpha ** i * beta ** (j - i)
+        # [A_other | y] = [A_self | y] @ change, so the factor of the data in this basis is R @ change^-1
+        return other.r @ np.linalg.inv(change)
+
+    def update(self, x, y):
+        """Add points; non-finite pairs are skipped (like dropna before polyfit)"""
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        keep = np.isfinite(x) & np.isfinite(y)
+        x, y = x[keep], y[keep]
+        if len(x) == 0:
+            return self
+        if self.n == 0:
+            self.shift = x.mean()
+            self.scale = np.abs(x - self.shift).max() or 1.0
+        self._absorb(np.column_stack([self._basis(x), y]))
+        self.n += len(x)
+        self.x_min, self.x_max = min(self.x_min, x.min()), max(self.x_max, x.max())
+        self.y_sum += y.sum()
+        self.y_sq_sum += np.dot(y, y)
+        return self
+
+    def merge(self, other):
+        """Fold another accumulator's points into this one"""
+        if other.degree != self.degree:
+            raise ValueError(f"Cannot merge degree {other.degree} into degree {self.degree}")
+        if other.n and self.n == 0:
+            self.shift, self.scale = other.shift, other.scale
+            self.r = other.r.copy()
+        elif other.n:
+            self._absorb(self._rebased(other))
+        if other.n:
+            self.n += other.n
+            self.x_min, self.x_max = min(self.x_min, other.x_min), max(self.x_max, other.x_max)
+            self.y_sum += other.y_sum
+            self.y_sq_sum += other.y_sq_sum
+        return self
+
+    def __add__(self, other):
+        merged = TrendAccumulator(self.degree).merge(self)
+        return merged.merge(other)
+
+    def _fit(self):
+        """Coefficients in the (shift, scale) basis, lowest power first"""
+        k = self.degree + 1
+        if self.n < k:
+            raise ValueError(f"Need at least {k} points for a degree {self.degree} fit, have {self.n}")
+        return np.linalg.lstsq(self.r[:k, :k], self.r[:k, k], rcond=None)[0]
+
+    def coefficients(self):
+        """Fitted coefficients in x, highest power first (np.polyfit order)"""
+        in_x = Polynomial(self._fit())(Polynomial([-self.shift / self.scale, 1 / self.scale]))
+        return np.pad(in_x.coef, (0, self.degree + 1 - len(in_x.coef)))[::-1]
+
+    def poly1d(self):
+        return np.poly1d(self.coefficients())
+
+    def predict(self, x):
+        # Evaluated in the scaled basis, which is better conditioned than raw powers of x
+        return self._basis(np.asarray(x, dtype=float)) @ self._fit()
+
+    def line(self, points=2):
+        """(x, y) of the fitted curve across the x range seen"""
+        x = np.linspace(self.x_min, self.x_max, points)
+        return x, self.predict(x)
+
+    def residual_ss(self):
+        """Sum of squared residuals of the fit"""
+        k = self.degree + 1
+        return float(self.r[k, k] ** 2) if self.r.shape[0] > k else 0.0
+
+    def r_squared(self):
+        total = self.y_sq_sum - self.y_sum ** 2 / self.n
+        return 1 - self.residual_ss() / total if total > 0 else np.nan
+
+
+class GroupedTrend:
+    """
+    One TrendAccumulator per group, updated chunk by chunk.
+
+    Parameters:
+        degree: polynomial degree of every group's fit
+    """
+
+    def __init__(self, degree=1):
+        self.degree = degree
+        self.groups = {}
+
+    def update(self, groups, x, y):
+        """Add points with their group labels (each chunk is split once, not filtered per group)"""
+        codes, uniques = pd.factorize(np.asarray(groups, dtype=object), use_na_sentinel=True)
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        order = np.argsort(codes, kind='stable')
+        offsets = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+        for code, group in enumerate(uniques):
+            rows = order[offsets[code]:offsets[code + 1]]
+            self.groups.setdefault(group, TrendAccumulator(self.degree)).update(x[rows], y[rows])
+        return self
+
+    def merge(self, other):
+        for group, accumulator in other.groups.items():
+            self.groups.setdefault(group, TrendAccumulator(self.degree)).merge(accumulator)
+        return self
+
+    def __getitem__(self, group):
+        return self.groups[group]
+
+    def __iter__(self):
+        return iter(self.groups)
+
+    def coefficients(self):
+        return {group: accumulator.coefficients() for group, accumulator in self.groups.items()}
+
+
+def accumulate(df, x, y, degree=1, by=None):
+    """
+    Accumulator of one frame's columns x, y (grouped by column by when given).
+
+    A plain module function so it can be sent to worker processes, e.g.
+    merge(partitioned.reduce_partitions(accumulate, 'Resources Index', 'Math Score')).
+    """
+    if by is None:
+        return TrendAccumulator(degree).update(df[x], df[y])
+    return GroupedTrend(degree).update(df[by], df[x], df[y])
+
+
+def merge(accumulators):
+    """Merge a list of accumulators (e.g. one per partition or process) into one"""
+    accumulators = list(accumulators)
+    first = accumulators[0]
+    start = TrendAccumulator(first.degree) if isinstance(first, TrendAccumulator) else GroupedTrend(first.degree)
+    return functools.reduce(lambda total, a: total.merge(a), accumulators, start)